@@ -0,0 +1,177 @@
+"""Custo por item de serializar as listagens: caminho do response_model
+(valida, converte pra python no modo json e o JSONResponse faz json.dumps)
+contra o caminho rápido (TypeAdapter pré-compilado + dump_json em bytes).
+
+Não precisa de banco, usa objetos do ORM montados na memória.
+
+    python -m benchmarks.serialization [quantidade de itens]
+"""
+
+import json
+import sys
+import timeit
+from datetime import datetime
+
+from pydantic import TypeAdapter
+
+from dscommerce_fastapi.db.models.categories import Category
+from dscommerce_fastapi.db.models.order_item import OrderItem
+from dscommerce_fastapi.db.models.orders import Order
+from dscommerce_fastapi.db.models.payment import Payment
+from dscommerce_fastapi.db.models.products import Product
+from dscommerce_fastapi.db.models.users import User
+from dscommerce_fastapi.routers import categories, orders, payments, products
+
+
+def build_products(count):
+    return [
+        Product(
+            id=id,
+            name=f'product {id}',
+            serial_code=f'code{id}',
+            description='description',
+            price=10.5,
+            img_url='https://example.com/img.png',
+            listing_categories=[
+                {'id': 1, 'name': 'category 1'},
+                {'id': 2, 'name': 'category 2'},
+            ],
+        )
+        for id in range(count)
+    ]
+
+
+def build_payments(count):
+    client = User(id=1, name='client')
+    return [
+        Payment(
+            id=id,
+            moment=datetime(2024, 1, 1),
+            order=Order(
+                id=id,
+                status=Order.OrderStatus.PAID,
+                created_at=datetime(2024, 1, 1),
+                client=client,
+            ),
+        )
+        for id in range(count)
+    ]
+
+
+def build_orders(count):
+    client = User(id=1, name='client')
+    items = [Product(id=id, name=f'product {id}') for id in range(3)]
+    return [
+        Order(
+            id=id,
+            status=Order.OrderStatus.WAITING_PAYMENT,
+            created_at=datetime(2024, 1, 1),
+            total_amount=31.5,
+            item_count=3,
+            client=client,
+            # os itens saem do order_item (o products é só leitura)
+            order_products_association=[
+                OrderItem(product=product, quantity=1, unit_price=10.5)
+                for product in items
+            ],
+        )
+        for id in range(count)
+    ]
+
+
+def build_categories(count):
+    return {
+        'categories': [
+            Category(
+                id=id, name=f'category {id}', parent_id=None, product_count=5
+            )
+            for id in range(count)
+        ]
+    }
+
+
+# o que o FastAPI faz com o response_model: valida o retorno, gera os
+# objetos python no modo json e o JSONResponse serializa com json.dumps
+def response_model_path(schema):
+    adapter = TypeAdapter(schema)
+
+    def run(value):
+        validated = adapter.validate_python(value, from_attributes=True)
+        return json.dumps(
+            adapter.dump_python(validated, mode='json'),
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ).encode()
+
+    return run
+
+
+def fast_path(adapter):
+    def run(value):
+        return adapter.dump_json(
+            adapter.validate_python(value, from_attributes=True)
+        )
+
+    return run
+
+
+# antes o read_payments montava cada PaymentRead na mão e depois o
+# response_model validava tudo de novo
+def payments_by_hand(value):
+    response = [
+        payments.PaymentRead.model_validate(payment, from_attributes=True)
+        for payment in value
+    ]
+    return response_model_path(list[payments.PaymentRead])(response)
+
+
+CASES = [
+    (
+        'products',
+        build_products,
+        response_model_path(list[products.ProductListingRead]),
+        fast_path(products.product_list_adapter),
+    ),
+    (
+        'payments',
+        build_payments,
+        payments_by_hand,
+        fast_path(payments.payment_list_adapter),
+    ),
+    (
+        'orders',
+        build_orders,
+        response_model_path(list[orders.OrderRead]),
+        fast_path(orders.order_list_adapter),
+    ),
+    (
+        'categories',
+        build_categories,
+        response_model_path(categories.ListCategoryRead),
+        fast_path(categories.category_list_adapter),
+    ),
+]
+
+
+def main(count=1000, repeat=5, number=20):
+    print(f'{count} itens, melhor de {repeat}x{number} (µs por item)')
+    for name, build, before, after in CASES:
+        value = build(count)
+        results = []
+        for run in (before, after):
+            best = min(
+                timeit.repeat(
+                    lambda: run(value),
+                    repeat=repeat,
+                    number=number,
+                )
+            )
+            results.append(best / number / count * 1_000_000)
+        print(
+            f'{name:<12} antes {results[0]:7.2f}  depois {results[1]:7.2f}'
+            f'  ({results[0] / results[1]:.1f}x)'
+        )
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
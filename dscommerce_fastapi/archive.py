@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from dscommerce_fastapi.database import engine
+from dscommerce_fastapi.db import utcnow
+from dscommerce_fastapi.db.models.archive import (
+    OrderArchive,
+    OrderItemArchive,
+    PaymentArchive,
+)
+from dscommerce_fastapi.db.models.order_item import OrderItem
+from dscommerce_fastapi.db.models.orders import Order
+from dscommerce_fastapi.db.models.payment import Payment
+from dscommerce_fastapi.db.models.products import Product
+from dscommerce_fastapi.db.models.users import User
+from dscommerce_fastapi.settings import Settings
+
+settings = Settings()
+
+# quantos pedidos são movidos por vez (e por transação)
+ARCHIVE_BATCH_SIZE = 500
+
+# status finais, pedido nesses status não muda mais
+ARCHIVABLE_STATUSES = (Order.OrderStatus.DELIVERED, Order.OrderStatus.CANCELED)
+
+orders = Order.__table__
+items = OrderItem.__table__
+payments = Payment.__table__
+
+# colunas de orders que vão iguais pro orders_archive
+ARCHIVED_ORDER_COLUMNS = [
+    'id',
+    'status',
+    'created_at',
+    'total_amount',
+    'item_count',
+    'version',
+    'client_id',
+]
+
+
+# copia um lote de pedidos (com itens e pagamento) pras tabelas de arquivo
+# e apaga das quentes, com INSERT ... SELECT e DELETE ... IN, sem trazer
+# nada pro python além dos ids. Tudo numa transação, ou o lote inteiro
+# muda de tabela ou nada muda
+def archive_batch(session, cutoff: datetime, batch_size: int) -> int:
+    ids = session.scalars(
+        select(orders.c.id)
+        .where(
+            orders.c.status.in_(ARCHIVABLE_STATUSES),
+            orders.c.created_at < cutoff,
+        )
+        .order_by(orders.c.id)
+        .limit(batch_size)
+    ).all()
+    if not ids:
+        return 0
+
+    session.execute(
+        insert(OrderArchive).from_select(
+            [*ARCHIVED_ORDER_COLUMNS, 'archived_at'],
+            select(
+                *(orders.c[name] for name in ARCHIVED_ORDER_COLUMNS),
+                # naive em UTC, igual às outras colunas DateTime
+                literal(utcnow(), OrderArchive.c.archived_at.type),
+            ).where(orders.c.id.in_(ids)),
+        )
+    )
+    session.execute(
+        insert(OrderItemArchive).from_select(
+            ['order_id', 'product_id', 'quantity', 'unit_price'],
+            select(
+                items.c.order_id,
+                items.c.product_id,
+                items.c.quantity,
+                items.c.unit_price,
+            ).where(items.c.order_id.in_(ids)),
+        )
+    )
+    session.execute(
+        insert(PaymentArchive).from_select(
+            ['id', 'moment', 'order_id'],
+            select(
+                payments.c.id, payments.c.moment, payments.c.order_id
+            ).where(payments.c.order_id.in_(ids)),
+        )
+    )
+
+    # filhos primeiro por causa das chaves estrangeiras
+    session.execute(delete(payments).where(payments.c.order_id.in_(ids)))
+    session.execute(delete(items).where(items.c.order_id.in_(ids)))
+    session.execute(delete(orders).where(orders.c.id.in_(ids)))
+    session.commit()
+
+    return len(ids)
+
+
+# arquiva os pedidos finalizados criados há mais de older_than_days dias,
+# em lotes de batch_size, um commit por lote pra não segurar uma transação
+# longa nem travar as tabelas quentes
+def archive_orders(
+    session,
+    older_than_days: int = settings.ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> int:
+    # naive em UTC como o created_at (utcnow), um datetime com fuso seria
+    # convertido pro fuso da sessão num banco com timestamp sem fuso
+    cutoff = utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        moved = archive_batch(session, cutoff, batch_size)
+        archived += moved
+        if moved < batch_size:
+            return archived
+
+
+# pedido arquivado no mesmo formato do OrderRead, com uma query pro
+# pedido (cliente e pagamento no join) e outra pros itens
+def get_archived_order(session, order_id: int, client_id: int) -> dict | None:
+    order = session.execute(
+        select(
+            OrderArchive,
+            User.name.label('client_name'),
+            PaymentArchive.c.id.label('payment_id'),
+            PaymentArchive.c.moment.label('payment_moment'),
+        )
+        .join(User, User.id == OrderArchive.c.client_id)
+        .outerjoin(
+            PaymentArchive, PaymentArchive.c.order_id == OrderArchive.c.id
+        )
+        .where(
+            OrderArchive.c.id == order_id,
+            OrderArchive.c.client_id == client_id,
+        )
+    ).one_or_none()
+    if order is None:
+        return None
+
+    order_items = session.execute(
+        select(
+            OrderItemArchive.c.product_id,
+            Product.name,
+            OrderItemArchive.c.quantity,
+            OrderItemArchive.c.unit_price,
+        )
+        .join(Product, Product.id == OrderItemArchive.c.product_id)
+        .where(OrderItemArchive.c.order_id == order_id)
+    ).all()
+
+    return {
+        'id': order.id,
+        'status': order.status,
+        'created_at': order.created_at,
+        'total_amount': order.total_amount,
+        'item_count': order.item_count,
+        'client': {'id': order.client_id, 'name': order.client_name},
+        # mesmo nome do relacionamento que o OrderRead lê os itens
+        'order_products_association': [
+            {
+                'product': {'id': item.product_id, 'name': item.name},
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+            }
+            for item in order_items
+        ],
+        'payment': (
+            {'id': order.payment_id, 'moment': order.payment_moment}
+            if order.payment_id is not None
+            else None
+        ),
+    }
+
+
+if __name__ == '__main__':
+    with Session(engine) as session:
+        archive_orders(session)
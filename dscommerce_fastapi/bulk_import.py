@@ -0,0 +1,210 @@
+import csv
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+from dscommerce_fastapi.db.models.products import (
+    Product,
+    ProductCategoryAssociation,
+)
+from dscommerce_fastapi.facets import increment_category_counts
+from dscommerce_fastapi.search import index_search_rows
+
+# quantas linhas são validadas e inseridas por vez (e por transação),
+# é o que limita a memória usada, independente do tamanho do arquivo
+BULK_CHUNK_SIZE = 500
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+CSV_MEDIA_TYPE = 'text/csv'
+
+# no CSV as categorias vêm numa coluna só, separadas por |, ex: 1|2|3
+CSV_CATEGORIES_SEPARATOR = '|'
+
+# tamanho máximo de uma linha, sem isso um corpo sem \n ficaria inteiro
+# no buffer
+BULK_MAX_LINE_BYTES = 64 * 1024
+
+
+# erro da linha que passou do BULK_MAX_LINE_BYTES
+LINE_TOO_LONG = f'Line longer than {BULK_MAX_LINE_BYTES} bytes'
+
+
+# lê o corpo da requisição conforme ele chega, linha por linha (em bytes),
+# sem nunca carregar o arquivo inteiro na memória. Uma linha longa demais
+# vira None e o resto dela é descartado sem ir pro buffer
+async def iter_lines(stream):
+    buffer = b''
+    # no meio de uma linha longa demais, descartando até o próximo \n
+    skipping = False
+    async for chunk in stream:
+        data = chunk
+        if skipping:
+            _, newline, data = chunk.partition(b'\n')
+            if not newline:
+                continue
+            skipping = False
+            yield None
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield None if len(line) > BULK_MAX_LINE_BYTES else line
+        # o que sobrou ainda não tem \n, então é o começo de uma linha
+        if len(buffer) > BULK_MAX_LINE_BYTES:
+            buffer = b''
+            skipping = True
+    if skipping:
+        yield None
+    elif buffer:
+        yield buffer
+
+
+# transforma as linhas em (número da linha, dict com os campos) ou
+# (número da linha, mensagem de erro), ignorando linhas em branco. Os
+# chunks anteriores já foram commitados, então linha ruim é erro dela
+# só e o arquivo continua
+async def iter_records(lines, media_type: str):
+    header = None
+    row = 0
+    async for raw in lines:
+        row += 1
+        if raw is None:
+            yield row, LINE_TOO_LONG
+            continue
+        try:
+            line = raw.decode().rstrip('\r')
+        except UnicodeDecodeError:
+            yield row, 'Invalid UTF-8'
+            continue
+        if not line.strip():
+            continue
+
+        if media_type == NDJSON_MEDIA_TYPE:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield row, 'Invalid JSON'
+                continue
+            if not isinstance(record, dict):
+                yield row, 'Invalid JSON'
+                continue
+            yield row, record
+            continue
+
+        # CSV: cada registro numa linha só, a primeira linha é o cabeçalho
+        values = next(csv.reader([line]))
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield row, 'Invalid number of columns'
+            continue
+
+        # célula vazia é campo não informado, igual a chave ausente no
+        # JSON (description fica None e não '')
+        record = {key: value for key, value in zip(header, values) if value}
+        categories_ids = record.get('categories_ids', '')
+        record['categories_ids'] = [
+            id for id in categories_ids.split(CSV_CATEGORIES_SEPARATOR) if id
+        ]
+        yield row, record
+
+
+def validate_record(record: dict, schema):
+    try:
+        return schema.model_validate(record), None
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        field = '.'.join(str(loc) for loc in error['loc'])
+        return None, f'{field}: {error["msg"]}'
+
+
+# valida e insere um chunk de produtos já convertidos pro schema, com uma
+# query pra serial_code, no máximo uma pra categorias e inserts em lote,
+# e commita
+def import_chunk(db, rows, current_user, categories):
+    errors = []
+
+    serial_codes = {data.serial_code for _, data in rows}
+    existing_serial_codes = set(
+        db.scalars(
+            select(Product.serial_code).where(
+                Product.serial_code.in_(serial_codes)
+            )
+        )
+    )
+
+    # o resolver guarda as categorias entre os chunks, então só vão pro
+    # banco (numa query só) as que ainda não apareceram no arquivo
+    active_categories_ids = categories.load({
+        id for _, data in rows for id in data.categories_ids
+    }).keys()
+
+    valid = []
+    for row, data in rows:
+        if data.serial_code in existing_serial_codes:
+            errors.append({'row': row, 'detail': 'Product already exists'})
+            continue
+
+        missing = [
+            id for id in data.categories_ids if id not in active_categories_ids
+        ]
+        if missing:
+            errors.append({
+                'row': row,
+                'detail': f'Category not found: {missing}',
+            })
+            continue
+
+        # serial_code repetido dentro do próprio arquivo
+        existing_serial_codes.add(data.serial_code)
+        valid.append(data)
+
+    if valid:
+        products_rows = [
+            {
+                **data.model_dump(exclude={'categories_ids'}),
+                'created_by_id': current_user.id,
+            }
+            for data in valid
+        ]
+        # insert em lote não passa pelo before_flush, então a listagem
+        # desnormalizada já vai montada em cada linha
+        products_ids = db.scalars(
+            insert(Product).returning(
+                Product.id, sort_by_parameter_order=True
+            ),
+            [
+                {
+                    **row,
+                    'listing_categories': categories.listing(
+                        data.categories_ids
+                    ),
+                }
+                for row, data in zip(products_rows, valid)
+            ],
+        ).all()
+
+        associations = [
+            {'product_id': product_id, 'category_id': category_id}
+            for product_id, data in zip(products_ids, valid)
+            # dict.fromkeys remove ids repetidos mantendo a ordem
+            for category_id in dict.fromkeys(data.categories_ids)
+        ]
+        if associations:
+            db.execute(insert(ProductCategoryAssociation), associations)
+            increment_category_counts(
+                db, [row['category_id'] for row in associations]
+            )
+
+        index_search_rows(
+            db,
+            [
+                {'id': product_id, **row}
+                for product_id, row in zip(products_ids, products_rows)
+            ],
+        )
+
+    db.commit()
+
+    return len(valid), errors
@@ -0,0 +1,141 @@
+from sqlalchemy import bindparam, select, update
+
+from dscommerce_fastapi.db import utcnow
+from dscommerce_fastapi.db.models.products import (
+    Product,
+    ProductCategoryAssociation,
+)
+from dscommerce_fastapi.facets import increment_category_counts
+from dscommerce_fastapi.search import index_search_rows
+
+# quantos produtos são alterados por vez (e por transação)
+BULK_UPDATE_CHUNK_SIZE = 500
+
+NOT_FOUND = 'Product not found'
+
+# colunas NOT NULL da tabela: null explícito nelas quebraria o UPDATE do
+# lote inteiro com IntegrityError
+NOT_NULL_FIELDS = {c.name for c in Product.__table__.columns if not c.nullable}
+
+
+# mesma regra do PATCH/DELETE /{product_id}: só produtos ativos criados
+# pelo usuário, com uma query só pro chunk inteiro
+def _owned_products(db, ids, current_user):
+    return {
+        row.id: row
+        for row in db.execute(
+            select(Product.id, Product.name, Product.description).where(
+                Product.id.in_(ids),
+                Product.is_active,
+                Product.created_by_id == current_user.id,
+            )
+        )
+    }
+
+
+# aplica os valores de cada produto com um UPDATE em lote (executemany) por
+# conjunto de campos alterados, e commita. items são ProductBulkUpdate
+def update_chunk(db, items, current_user):
+    owned = _owned_products(db, [item.id for item in items], current_user)
+    products = Product.__table__
+
+    updated, errors = [], []
+    groups = {}
+    for item in items:
+        if item.id not in owned:
+            errors.append({'id': item.id, 'detail': NOT_FOUND})
+            continue
+
+        values = item.model_dump(exclude_unset=True, exclude={'id'})
+        if not values:
+            errors.append({'id': item.id, 'detail': 'Nothing to update'})
+            continue
+        null_fields = sorted(
+            key
+            for key, value in values.items()
+            if value is None and key in NOT_NULL_FIELDS
+        )
+        if null_fields:
+            errors.append({
+                'id': item.id,
+                'detail': f'Fields cannot be null: {", ".join(null_fields)}',
+            })
+            continue
+
+        # o executemany precisa que todas as linhas tenham os mesmos campos
+        groups.setdefault(tuple(sorted(values)), []).append({
+            'b_id': item.id,
+            **{f'b_{key}': value for key, value in values.items()},
+        })
+        updated.append(item.id)
+
+    search_rows = []
+    for fields, params in groups.items():
+        db.execute(
+            update(products)
+            .where(products.c.id == bindparam('b_id'))
+            .values(
+                **{field: bindparam(f'b_{field}') for field in fields},
+                updated_by_id=current_user.id,
+                # UPDATE direto não passa pelo version_id_col do ORM
+                version=products.c.version + 1,
+            ),
+            params,
+        )
+        if 'name' in fields or 'description' in fields:
+            for row in params:
+                old = owned[row['b_id']]
+                search_rows.append({
+                    'id': old.id,
+                    'name': row.get('b_name', old.name),
+                    'description': row.get('b_description', old.description),
+                })
+
+    index_search_rows(db, search_rows)
+    db.commit()
+
+    return updated, errors
+
+
+# soft-delete de um chunk de ids com um UPDATE ... WHERE id IN (...) que
+# já confere dono e is_active, e o RETURNING diz quais ele pegou de fato:
+# um DELETE /{product_id} no meio não é contado duas vezes
+def delete_chunk(db, ids, current_user):
+    products = Product.__table__
+    removed = set(
+        db.scalars(
+            update(products)
+            .where(
+                products.c.id.in_(ids),
+                products.c.is_active,
+                products.c.created_by_id == current_user.id,
+            )
+            .values(
+                is_active=False,
+                deleted_at=utcnow(),
+                deleted_by_id=current_user.id,
+                version=products.c.version + 1,
+            )
+            .returning(products.c.id)
+        )
+    )
+    errors = [
+        {'id': id, 'detail': NOT_FOUND} for id in ids if id not in removed
+    ]
+    deleted = [id for id in ids if id in removed]
+
+    if deleted:
+        # um id por vínculo, a categoria perde um produto por linha
+        increment_category_counts(
+            db,
+            db.scalars(
+                select(ProductCategoryAssociation.c.category_id).where(
+                    ProductCategoryAssociation.c.product_id.in_(deleted)
+                )
+            ).all(),
+            delta=-1,
+        )
+
+    db.commit()
+
+    return deleted, errors
@@ -0,0 +1,223 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+
+from dscommerce_fastapi.settings import Settings
+
+settings = Settings()
+
+
+# -------- Backends --------
+# todo backend guarda só bytes com get/set/delete/clear, então dá pra trocar
+# o de memória por um compartilhado (redis, memcached...) sem mexer nas rotas
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # OrderedDict guarda a ordem de uso, o primeiro é o menos usado
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # as rotas síncronas rodam em threads, então precisa de lock
+        self._lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# substituto de um cache compartilhado entre processos: sem LRU, só com
+# expiração por chave e um limite de entradas (como o maxmemory de um redis),
+# e copiando os bytes na entrada e na saída como se tivessem passado pela rede
+class SharedCache:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # dict guarda a ordem de inserção, o primeiro é o mais antigo
+        self._store: dict[str, tuple[float, bytes]] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._store[key]
+                return None
+        return bytes(entry[1])
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            # regravar a chave manda ela pro fim da fila
+            self._store.pop(key, None)
+            self._store[key] = (time.time() + self.ttl_seconds, bytes(value))
+            if len(self._store) > self.max_entries:
+                self._evict()
+
+    # primeiro tira as expiradas (as de gerações antigas expiram também),
+    # se ainda passar do limite tira as mais antigas
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, (exp, _) in self._store.items() if exp < now]:
+            del self._store[key]
+        while len(self._store) > self.max_entries:
+            del self._store[next(iter(self._store))]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._store.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+    def __len__(self):
+        return len(self._store)
+
+
+def build_backend(backend: str, max_entries: int, ttl_seconds: int):
+    if backend == 'memory':
+        return LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if backend == 'shared':
+        return SharedCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    raise ValueError(f'Unknown cache backend: {backend}')
+
+
+# -------- fim Backends --------
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    headers: dict[str, str]
+
+    # uma linha com os headers em JSON e depois o corpo, como já está
+    def to_bytes(self) -> bytes:
+        return json.dumps(self.headers).encode() + b'\n' + self.body
+
+    @classmethod
+    def from_bytes(cls, raw: bytes):
+        headers, body = raw.split(b'\n', 1)
+        return cls(body=body, headers=json.loads(headers))
+
+
+# cache de respostas já serializadas, separado por namespace (ex: detalhe de
+# produto, listagem de produtos). Cada namespace tem uma geração que faz
+# parte da chave, então invalidar um namespace inteiro é só trocar a geração,
+# sem precisar saber quais chaves existem. Cada chave tem a sua geração também,
+# e apagar uma chave é trocar a geração dela.
+# A rota resolve a chave uma vez só com key() antes de ir no banco e usa a
+# mesma no get e no set: se alguém invalidar no meio, a resposta montada com
+# os dados antigos fica na geração velha e ninguém mais lê ela
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self, scope: str) -> str:
+        generation_key = f'generation:{scope}'
+        generation = self.backend.get(generation_key)
+        if generation is None:
+            # se a geração sumiu (expirou ou foi limpa) cria uma nova,
+            # assim nada que foi salvo antes pode voltar
+            return self._new_generation(scope)
+        return generation.decode()
+
+    def _new_generation(self, scope: str) -> str:
+        generation = uuid.uuid4().hex
+        self.backend.set(f'generation:{scope}', generation.encode())
+        return generation
+
+    # a chave no backend com as gerações atuais do namespace e da chave
+    def key(self, namespace: str, key: str) -> str:
+        namespace_generation = self._generation(namespace)
+        key_generation = self._generation(f'{namespace}:{key}')
+        return f'{namespace}:{namespace_generation}:{key}:{key_generation}'
+
+    def get(self, cache_key: str) -> CachedResponse | None:
+        raw = self.backend.get(cache_key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResponse.from_bytes(raw)
+
+    def set(self, cache_key: str, response: CachedResponse):
+        self.backend.set(cache_key, response.to_bytes())
+
+    def delete(self, namespace: str, key: str):
+        self._new_generation(f'{namespace}:{key}')
+
+    def invalidate(self, namespace: str):
+        self._new_generation(namespace)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# namespaces do catálogo
+PRODUCT_NAMESPACE = 'product'
+PRODUCT_LIST_NAMESPACE = 'product-list'
+
+product_cache = ResponseCache(
+    build_backend(
+        settings.CACHE_BACKEND,
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.CACHE_TTL_SECONDS,
+    )
+)
+
+
+# produto alterado/removido: some o detalhe dele e todas as listagens
+def invalidate_product(product_id: int):
+    product_cache.delete(PRODUCT_NAMESPACE, str(product_id))
+    product_cache.invalidate(PRODUCT_LIST_NAMESPACE)
+
+
+# categoria alterada aparece dentro de qualquer produto, então limpa tudo
+def invalidate_catalog():
+    product_cache.invalidate(PRODUCT_NAMESPACE)
+    product_cache.invalidate(PRODUCT_LIST_NAMESPACE)
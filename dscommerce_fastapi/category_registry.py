@@ -0,0 +1,129 @@
+import time
+from dataclasses import dataclass
+from threading import Lock
+from types import MappingProxyType
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from dscommerce_fastapi.db.models.categories import Category
+from dscommerce_fastapi.settings import Settings
+
+settings = Settings()
+
+
+@dataclass(frozen=True)
+class CategoryEntry:
+    id: int
+    name: str
+    parent_id: int | None
+
+
+# foto imutável das categorias ativas, quem pegou uma continua usando ela
+# inteira mesmo que outra requisição troque a do registry no meio
+@dataclass(frozen=True)
+class CategorySnapshot:
+    version: int
+    by_id: MappingProxyType
+    by_name: MappingProxyType
+    built_at: float
+
+
+# categorias ativas do processo todo, reconstruídas do banco (uma query)
+# quando alguma categoria muda. A idade máxima é pra outros processos
+# (workers) também enxergarem mudanças feitas fora deles
+class CategoryRegistry:
+    def __init__(self, max_age_seconds: int):
+        self.max_age_seconds = max_age_seconds
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshot: CategorySnapshot | None = None
+        self._lock = Lock()
+
+    def get(self, session) -> CategorySnapshot:
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and snapshot.version == self.version
+            and time.monotonic() - snapshot.built_at < self.max_age_seconds
+        ):
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        return self.rebuild(session)
+
+    def rebuild(self, session) -> CategorySnapshot:
+        with self._lock:
+            version = self.version
+            entries = [
+                CategoryEntry(id=id, name=name, parent_id=parent_id)
+                for id, name, parent_id in session.execute(
+                    select(Category.id, Category.name, Category.parent_id)
+                    .where(Category.is_active)
+                    .order_by(Category.id)
+                )
+            ]
+            snapshot = CategorySnapshot(
+                version=version,
+                by_id=MappingProxyType({e.id: e for e in entries}),
+                by_name=MappingProxyType({e.name: e for e in entries}),
+                built_at=time.monotonic(),
+            )
+            # se invalidaram enquanto carregava, essa já nasce velha e a
+            # próxima leitura reconstrói
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        snapshot = self._snapshot
+        return {
+            'version': self.version,
+            'size': len(snapshot.by_id) if snapshot else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.invalidate()
+        self.hits = 0
+        self.misses = 0
+
+
+category_registry = CategoryRegistry(
+    max_age_seconds=settings.CACHE_TTL_SECONDS
+)
+
+
+# qualquer categoria criada/alterada/removida pelo ORM invalida o registry
+# no flush (a própria sessão já enxerga a mudança) e de novo no commit ou
+# rollback, pra descartar uma foto montada antes da transação terminar
+@event.listens_for(Session, 'after_flush')
+def _categories_flushed(session, flush_context):
+    # include_collections=False: adicionar produto na categoria (lado
+    # products da relação) não muda a categoria em si
+    if any(
+        isinstance(obj, Category)
+        and (
+            obj not in session.dirty
+            or session.is_modified(obj, include_collections=False)
+        )
+        for obj in [*session.new, *session.dirty, *session.deleted]
+    ):
+        session.info['categories_changed'] = True
+        category_registry.invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _categories_committed(session):
+    if session.info.pop('categories_changed', False):
+        category_registry.invalidate()
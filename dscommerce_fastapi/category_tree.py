@@ -0,0 +1,110 @@
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, literal, select, update
+
+from dscommerce_fastapi.db.models.categories import Category, CategoryClosure
+from dscommerce_fastapi.db.models.products import ProductCategoryAssociation
+
+closure = CategoryClosure.c
+
+
+# ids da categoria e de tudo que está abaixo dela (subcategorias de
+# qualquer nível), um select só pela closure table
+def subtree_ids(category_id: int):
+    return select(closure.descendant_id).where(
+        closure.ancestor_id == category_id
+    )
+
+
+# ids dos produtos ligados à categoria ou a qualquer subcategoria dela,
+# um join só entre category_closure e product_category
+def subtree_products_ids(category_id: int):
+    return (
+        select(ProductCategoryAssociation.c.product_id)
+        .join(
+            CategoryClosure,
+            closure.descendant_id == ProductCategoryAssociation.c.category_id,
+        )
+        .where(closure.ancestor_id == category_id)
+    )
+
+
+# move a categoria (com tudo que está abaixo dela) pra baixo de outro pai,
+# ou pra raiz com parent_id None, com um DELETE e um INSERT ... SELECT
+def move_category(session, category: Category, parent_id: int | None):
+    if parent_id is not None and session.scalar(
+        select(closure.descendant_id).where(
+            closure.ancestor_id == category.id,
+            closure.descendant_id == parent_id,
+        )
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Category cannot be moved under itself',
+        )
+
+    subtree = subtree_ids(category.id)
+    # caminhos que ligam a subárvore aos ancestrais antigos
+    session.execute(
+        delete(CategoryClosure).where(
+            closure.descendant_id.in_(subtree),
+            closure.ancestor_id.not_in(subtree),
+        )
+    )
+
+    if parent_id is not None:
+        ancestors = CategoryClosure.alias('ancestors')
+        descendants = CategoryClosure.alias('descendants')
+        # cada ancestral do novo pai com cada categoria da subárvore
+        session.execute(
+            insert(CategoryClosure).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(
+                    ancestors.c.ancestor_id,
+                    descendants.c.descendant_id,
+                    ancestors.c.depth + descendants.c.depth + 1,
+                )
+                .select_from(ancestors)
+                .join(descendants, literal(True))
+                .where(
+                    ancestors.c.descendant_id == parent_id,
+                    descendants.c.ancestor_id == category.id,
+                ),
+            )
+        )
+
+    category.parent_id = parent_id
+
+
+# tira a categoria da árvore (soft-delete): os filhos sobem pro pai dela,
+# então o que estava abaixo dela continua abaixo dos ancestrais de antes
+def remove_category_from_tree(session, category: Category):
+    below = select(closure.descendant_id).where(
+        closure.ancestor_id == category.id,
+        closure.descendant_id != category.id,
+    )
+    above = select(closure.ancestor_id).where(
+        closure.descendant_id == category.id,
+        closure.ancestor_id != category.id,
+    )
+    # um nível a menos entre os ancestrais dela e tudo que está abaixo
+    session.execute(
+        update(CategoryClosure)
+        .where(
+            closure.ancestor_id.in_(above), closure.descendant_id.in_(below)
+        )
+        .values(depth=closure.depth - 1)
+    )
+    session.execute(
+        delete(CategoryClosure).where(
+            (closure.ancestor_id == category.id)
+            | (closure.descendant_id == category.id)
+        )
+    )
+    session.execute(
+        update(Category)
+        .where(Category.parent_id == category.id)
+        .values(parent_id=category.parent_id)
+        .execution_options(synchronize_session=False)
+    )
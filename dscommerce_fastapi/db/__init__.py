@@ -1,3 +1,5 @@
+from datetime import UTC, datetime
+
 from sqlalchemy import MetaData, create_engine, select
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
@@ -20,6 +22,13 @@ class Base(DeclarativeBase):
     metadata = MetaData(naming_convention=convention)
 
 
+# naive em UTC e preenchido pelo python, assim todo valor é gravado com a
+# mesma precisão (microssegundos) e compara igual a um datetime vindo de
+# um cursor, o func.now() do sqlite grava sem a fração de segundo
+def utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
 def create_user():
     from dscommerce_fastapi.db.models.users import User
 
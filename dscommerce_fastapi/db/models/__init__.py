@@ -1,3 +1,5 @@
+from dscommerce_fastapi.db.models.archive import *  # noqa: F403
 from dscommerce_fastapi.db.models.categories import *  # noqa: F403
+from dscommerce_fastapi.db.models.idempotency import *  # noqa: F403
 from dscommerce_fastapi.db.models.products import *  # noqa: F403
 from dscommerce_fastapi.db.models.users import *  # noqa: F403
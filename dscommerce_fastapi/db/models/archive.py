@@ -0,0 +1,56 @@
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Table,
+)
+
+from dscommerce_fastapi.db import Base
+from dscommerce_fastapi.db.models.orders import Order
+
+# -------- Tabelas frias dos pedidos finalizados (archive.py) --------
+
+# mesmas colunas de orders, order_item e payments, pra onde vão os pedidos
+# DELIVERED/CANCELED antigos, assim as tabelas quentes (e os índices delas)
+# ficam só com o que ainda muda. São só Table, ninguém altera pedido
+# arquivado, só lê (GET /orders/{order_id})
+
+OrderArchive = Table(
+    'orders_archive',
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    # native_enum=False: fica como texto, sem criar outro tipo enum no banco
+    Column(
+        'status', Enum(Order.OrderStatus, native_enum=False), nullable=False
+    ),
+    Column('created_at', DateTime, nullable=False),
+    Column('total_amount', Float, nullable=False),
+    Column('item_count', Integer, nullable=False),
+    Column('version', Integer, nullable=False),
+    Column('client_id', ForeignKey('users.id'), nullable=False),
+    Column('archived_at', DateTime, nullable=False),
+    Index('ix_orders_archive_client_id', 'client_id'),
+)
+
+OrderItemArchive = Table(
+    'order_item_archive',
+    Base.metadata,
+    Column('order_id', ForeignKey('orders_archive.id'), primary_key=True),
+    Column('product_id', ForeignKey('products.id'), primary_key=True),
+    Column('quantity', Integer, nullable=False),
+    Column('unit_price', Float, nullable=False),
+)
+
+PaymentArchive = Table(
+    'payments_archive',
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('moment', DateTime, nullable=False),
+    Column(
+        'order_id', ForeignKey('orders_archive.id'), nullable=False, index=True
+    ),
+)
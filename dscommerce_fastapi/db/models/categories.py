@@ -1,7 +1,18 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    Table,
+    event,
+    func,
+    insert,
+    literal,
+    select,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from dscommerce_fastapi.db import Base
@@ -21,6 +32,9 @@ class Category(Base):
     updated_at: Mapped[Optional[datetime]] = mapped_column(onupdate=func.now())
     deleted_at: Mapped[Optional[datetime]] = mapped_column()
     is_active: Mapped[bool] = mapped_column(default=True)
+    # produtos ativos na categoria, mantido a cada escrita por
+    # increment_category_counts (dscommerce_fastapi/facets.py)
+    product_count: Mapped[int] = mapped_column(default=0, server_default='0')
 
     # Foreign Keys
 
@@ -31,6 +45,11 @@ class Category(Base):
     deleted_by_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey('users.id')
     )
+    # categoria pai, None é categoria raiz. A árvore inteira também fica na
+    # category_closure lá embaixo, que é o que as consultas usam
+    parent_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey('categories.id'), index=True
+    )
 
     # Relationships
 
@@ -51,3 +70,39 @@ class Category(Base):
     deleted_by: Mapped[Optional['User']] = relationship(
         foreign_keys=[deleted_by_id]
     )
+
+
+# closure table da árvore de categorias: uma linha pra cada par
+# (ancestral, descendente), incluindo a própria categoria com depth 0, então
+# "tudo abaixo de X" é um join só por ancestor_id, sem consulta recursiva.
+# É mantida por dscommerce_fastapi/category_tree.py
+CategoryClosure = Table(
+    'category_closure',
+    Base.metadata,
+    Column('ancestor_id', ForeignKey('categories.id'), primary_key=True),
+    Column('descendant_id', ForeignKey('categories.id'), primary_key=True),
+    Column('depth', Integer, nullable=False),
+    Index('ix_category_closure_descendant_id', 'descendant_id'),
+)
+
+
+# toda categoria nova (pela API, factories...) entra na árvore no mesmo
+# flush: a linha dela mesma (depth 0) e uma pra cada ancestral do pai
+@event.listens_for(Category, 'after_insert')
+def add_category_to_tree(mapper, connection, target):
+    connection.execute(
+        insert(CategoryClosure).values(
+            ancestor_id=target.id, descendant_id=target.id, depth=0
+        )
+    )
+    if target.parent_id is not None:
+        connection.execute(
+            insert(CategoryClosure).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(
+                    CategoryClosure.c.ancestor_id,
+                    literal(target.id),
+                    CategoryClosure.c.depth + 1,
+                ).where(CategoryClosure.c.descendant_id == target.parent_id),
+            )
+        )
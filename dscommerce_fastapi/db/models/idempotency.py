@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from dscommerce_fastapi.db import Base
+
+
+# resposta guardada de um POST feito com Idempotency-Key, a chave é por
+# usuário, então a busca do retry é pela chave primária (user_id, key)
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id'), primary_key=True
+    )
+    key: Mapped[str] = mapped_column(primary_key=True)
+    # sha256 da rota + corpo da requisição, a mesma chave com outro corpo
+    # não é retry, é erro do cliente
+    request_hash: Mapped[str]
+    status_code: Mapped[int]
+    response_body: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime]
+    # índice pra limpeza em lotes das chaves vencidas
+    expires_at: Mapped[datetime] = mapped_column(index=True)
@@ -1,6 +1,6 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, false
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from dscommerce_fastapi.db import Base
@@ -21,6 +21,16 @@ class OrderItem(Base):
         ForeignKey('products.id'), primary_key=True
     )
     quantity: Mapped[int]
+    # preço do produto no momento da compra, o Product.price pode mudar depois
+    unit_price: Mapped[float] = mapped_column(server_default='0')
+    # o que foi descontado do estoque na criação do pedido (stock.py), pro
+    # cancelamento devolver só isso mesmo que o modo de estoque do produto
+    # tenha mudado depois: sem reserva (produto sem controle de estoque),
+    # do contador (stock_shard None) ou de um shard
+    stock_reserved: Mapped[bool] = mapped_column(
+        default=False, server_default=false()
+    )
+    stock_shard: Mapped[Optional[int]]
 
     order: Mapped['Order'] = relationship(
         back_populates='order_products_association'
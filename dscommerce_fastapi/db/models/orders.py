@@ -2,10 +2,10 @@ from datetime import datetime
 from enum import Enum
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import Column, ForeignKey, Table, func
+from sqlalchemy import Column, ForeignKey, Index, Table
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from dscommerce_fastapi.db import Base
+from dscommerce_fastapi.db import Base, utcnow
 from dscommerce_fastapi.db.models.order_item import OrderItem
 from dscommerce_fastapi.db.models.payment import Payment
 
@@ -35,9 +35,18 @@ class Order(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     status: Mapped[OrderStatus]
-    created_at: Mapped[datetime] = mapped_column(
-        default=func.now()
-    )  # moment do diagrama
+    # moment do diagrama, preenchido pelo python (ver utcnow) pra ter a
+    # mesma precisão do datetime que vem no cursor da listagem
+    created_at: Mapped[datetime] = mapped_column(default=utcnow)
+    # totais calculados na criação do pedido, a partir do unit_price dos
+    # itens, pra listagem/relatórios não precisarem somar order_item
+    total_amount: Mapped[float] = mapped_column(default=0, server_default='0')
+    # quantidade de unidades (soma das quantities), não de linhas
+    item_count: Mapped[int] = mapped_column(default=0, server_default='0')
+    # versão da linha, o sqlalchemy incrementa sozinho em todo UPDATE pelo
+    # ORM (version_id_col lá embaixo), e as trocas de status (order_status.py)
+    # incrementam no próprio UPDATE condicional
+    version: Mapped[int] = mapped_column(default=1, server_default='1')
     # removi updated_at e removed_at pois pra mim não faz sentido apagar ou modificar um pedido já pronto com exceção do status dele
 
     # Foreign Keys
@@ -49,8 +58,10 @@ class Order(Base):
     # -------- Many-To-Many entre Order e product com tabela intermediária e atributos extras --------
 
     # orders é o nome do atributo lá em Product
+    # viewonly porque o order_item tem quantity (NOT NULL), que essa relação
+    # não tem como preencher, os itens são gravados pelo OrderItem
     products: Mapped[List['Product']] = relationship(
-        secondary='order_item', back_populates='orders'
+        secondary='order_item', back_populates='orders', viewonly=True
     )
 
     order_products_association: Mapped[List['OrderItem']] = relationship(
@@ -70,3 +81,18 @@ class Order(Base):
     payment: Mapped[Optional['Payment']] = relationship(
         back_populates='order',
     )
+
+    # o created_at vem do utcnow (python), então já está no objeto depois
+    # do INSERT e dá pra responder sem ir buscar o pedido de novo
+    __mapper_args__ = {'version_id_col': version}
+
+
+# histórico de pedidos do cliente (GET /orders), do mais novo pro mais
+# antigo e paginado por cursor, o banco vai direto pra página no índice
+# sem ordenar nem pular linhas. O id desempata pedidos do mesmo instante
+Index(
+    'ix_orders_client_id_created_at_id',
+    Order.client_id,
+    Order.created_at.desc(),
+    Order.id.desc(),
+)
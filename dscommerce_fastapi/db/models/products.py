@@ -1,15 +1,26 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import Column, ForeignKey, Table, func
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import (
+    DDL,
+    JSON,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    Table,
+    event,
+    func,
+    inspect,
+)
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 
 from dscommerce_fastapi.db.models.order_item import OrderItem
 from dscommerce_fastapi.db.models.orders import Order
 
 if TYPE_CHECKING:
     from dscommerce_fastapi.db.models.categories import Category
-from dscommerce_fastapi.db import Base
+from dscommerce_fastapi.db import Base, utcnow
 from dscommerce_fastapi.db.models.users import User
 
 # Tabela de associação Many-To-Many entre Product e Category
@@ -18,11 +29,45 @@ ProductCategoryAssociation = Table(
     Base.metadata,
     Column('product_id', ForeignKey('products.id'), primary_key=True),
     Column('category_id', ForeignKey('categories.id'), primary_key=True),
+    # a chave primária começa pelo product_id, então os produtos de uma
+    # categoria (GET /categories/{id}/products e o DELETE dos vínculos no
+    # delete_category) precisam desse outro índice
+    Index(
+        'ix_product_category_category_id_product_id',
+        'category_id',
+        'product_id',
+    ),
+)
+
+
+# estoque de um produto dividido em vários contadores (shards): cada pedido
+# desconta de um shard sorteado, então pedidos ao mesmo tempo do mesmo
+# produto quase sempre atualizam linhas diferentes e não esperam um pelo outro
+ProductStockShard = Table(
+    'product_stock_shard',
+    Base.metadata,
+    Column('product_id', ForeignKey('products.id'), primary_key=True),
+    Column('shard', Integer, primary_key=True),
+    Column('quantity', Integer, nullable=False),
 )
 
 
 class Product(Base):
     __tablename__ = 'products'
+    # índices compostos pra paginação por cursor (keyset) da listagem, um
+    # por ordenação, assim o banco vai direto pra próxima página na ordem
+    # do índice ao invés de ordenar e pular linhas
+    __table_args__ = (
+        Index('ix_products_is_active_id', 'is_active', 'id'),
+        Index('ix_products_is_active_price_id', 'is_active', 'price', 'id'),
+        Index(
+            'ix_products_is_active_created_at_id',
+            'is_active',
+            'created_at',
+            'id',
+        ),
+        Index('ix_products_is_active_name_id', 'is_active', 'name', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
@@ -30,10 +75,24 @@ class Product(Base):
     description: Mapped[Optional[str]]
     price: Mapped[float]
     img_url: Mapped[str]
-    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    created_at: Mapped[datetime] = mapped_column(default=utcnow)
     updated_at: Mapped[Optional[datetime]] = mapped_column(onupdate=func.now())
     deleted_at: Mapped[Optional[datetime]] = mapped_column()
     is_active: Mapped[bool] = mapped_column(default=True)
+    # versão da linha, o sqlalchemy incrementa sozinho em todo UPDATE
+    # (version_id_col lá embaixo) e é usada pra montar a ETag
+    version: Mapped[int] = mapped_column(default=1, server_default='1')
+    # cópia desnormalizada das categorias ativas ([{'id': ..., 'name': ...}])
+    # pra listagem sair de uma query só, sem passar por product_category,
+    # é mantida pelo before_flush lá embaixo e pelo listing.py
+    listing_categories: Mapped[list] = mapped_column(
+        JSON, default=list, server_default='[]'
+    )
+    # estoque disponível, None é produto sem controle de estoque. Quando
+    # stock_shards > 0 o estoque fica dividido nas linhas de
+    # product_stock_shard (pra produto muito disputado) e stock fica None
+    stock: Mapped[Optional[int]]
+    stock_shards: Mapped[int] = mapped_column(default=0, server_default='0')
 
     # Foreign keys
 
@@ -89,7 +148,7 @@ class Product(Base):
 
     # -------- Many-To-Many entre Order e product com tabela intermediária e atributos extras --------
     orders: Mapped[Optional[List['Order']]] = relationship(
-        secondary='order_item', back_populates='products'
+        secondary='order_item', back_populates='products', viewonly=True
     )
 
     order_products_association: Mapped[List['OrderItem']] = relationship(
@@ -99,7 +158,64 @@ class Product(Base):
 
     # -------- fim Many-To-Many entre Order e product com tabela intermediária e atributos extras --------
 
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
         return f'<Product(id={self.id!r}, name={self.name!r}, \
         description={self.description!r}, price={self.price!r}, \
         created_at={self.created_at!r}, updated_at={self.updated_at!r})>'
+
+
+# -------- Índices de busca textual (usados em search.py) --------
+
+# documento de busca do postgres, tem que ser igual no índice e na consulta
+PG_SEARCH_DOCUMENT = (
+    "to_tsvector('portuguese', coalesce(products.name, '') || ' ' || "
+    "coalesce(products.description, ''))"
+)
+
+# não dá pra declarar tabela virtual / índice GIN de expressão direto no
+# model, então cria junto com a tabela products pelo evento after_create
+event.listen(
+    Product.__table__,
+    'after_create',
+    DDL(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS products_fts '
+        'USING fts5(name, description)'
+    ).execute_if(dialect='sqlite'),
+)
+event.listen(
+    Product.__table__,
+    'after_create',
+    DDL(
+        'CREATE INDEX IF NOT EXISTS ix_products_search '
+        f'ON products USING gin ({PG_SEARCH_DOCUMENT})'
+    ).execute_if(dialect='postgresql'),
+)
+event.listen(
+    Product.__table__,
+    'before_drop',
+    DDL('DROP TABLE IF EXISTS products_fts').execute_if(dialect='sqlite'),
+)
+
+# -------- fim índices de busca textual --------
+
+
+# sempre que as categorias de um produto mudam pelo ORM (create, update,
+# factories...), atualiza listing_categories no mesmo flush, então entra na
+# mesma transação e no mesmo UPDATE (incrementando a version)
+@event.listens_for(Session, 'before_flush')
+def sync_listing_categories(session, flush_context, instances):
+    for obj in [*session.new, *session.dirty]:
+        if not isinstance(obj, Product):
+            continue
+        if (
+            obj in session.new
+            or inspect(obj).attrs.categories.history.has_changes()
+        ):
+            obj.listing_categories = [
+                {'id': category.id, 'name': category.name}
+                for category in obj.categories
+                # is_active ainda é None em categoria que nem foi inserida
+                if category.is_active is not False
+            ]
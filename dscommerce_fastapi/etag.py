@@ -0,0 +1,29 @@
+import hashlib
+from http import HTTPStatus
+
+from fastapi import Response
+
+
+# ETag forte: hash dos valores que mudam sempre que a representação muda
+# (ex: id, versão e updated_at), sem precisar montar o corpo da resposta
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode(), usedforsecurity=False)
+    return f'"{digest.hexdigest()}"'
+
+
+# If-None-Match pode ter várias ETags separadas por vírgula ou *,
+# e a comparação pra GET é a fraca, então ignora o prefixo W/
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in [
+        tag.removeprefix('W/') for tag in candidates
+    ]
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+    )
@@ -0,0 +1,90 @@
+from collections import Counter
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from dscommerce_fastapi.database import engine
+from dscommerce_fastapi.db.models.categories import Category
+from dscommerce_fastapi.db.models.products import (
+    Product,
+    ProductCategoryAssociation,
+)
+
+
+# quantidade de produtos por categoria. Sem products_ids (sem filtro) lê o
+# Category.product_count mantido nas escritas, com products_ids (um select
+# dos ids filtrados) faz uma query agrupada só sobre product_category
+def count_categories(session, products_ids=None) -> list[dict]:
+    if products_ids is None:
+        query = (
+            select(
+                Category.id,
+                Category.name,
+                Category.product_count.label('count'),
+            )
+            .where(Category.is_active, Category.product_count > 0)
+            .order_by(Category.id)
+        )
+    else:
+        query = (
+            select(Category.id, Category.name, func.count().label('count'))
+            .join(
+                ProductCategoryAssociation,
+                ProductCategoryAssociation.c.category_id == Category.id,
+            )
+            .where(
+                Category.is_active,
+                ProductCategoryAssociation.c.product_id.in_(products_ids),
+            )
+            .group_by(Category.id, Category.name)
+            .order_by(Category.id)
+        )
+
+    return [row._asdict() for row in session.execute(query)]
+
+
+# soma delta no product_count de cada id (um id repetido soma de novo), com
+# um UPDATE em lote na mesma transação da escrita. É incremento no próprio
+# banco (product_count + delta), então escritas concorrentes não se perdem
+def increment_category_counts(session, categories_ids, delta=1):
+    deltas = Counter(categories_ids)
+    if not deltas:
+        return
+
+    categories = Category.__table__
+    session.execute(
+        update(categories)
+        .where(categories.c.id == bindparam('b_id'))
+        .values(
+            product_count=categories.c.product_count + bindparam('b_delta')
+        ),
+        [
+            {'b_id': id, 'b_delta': count * delta}
+            for id, count in deltas.items()
+        ],
+    )
+
+
+# recalcula o product_count de todas as categorias com um UPDATE só, pra
+# rodar depois de cargas feitas por fora da API ou se a contagem sair do
+# lugar: python -m dscommerce_fastapi.facets
+def reconcile_category_counts(session):
+    active_products = (
+        select(func.count())
+        .select_from(ProductCategoryAssociation)
+        .join(Product, Product.id == ProductCategoryAssociation.c.product_id)
+        .where(
+            ProductCategoryAssociation.c.category_id == Category.id,
+            Product.is_active,
+        )
+        .scalar_subquery()
+    )
+    session.execute(
+        update(Category.__table__).values(product_count=active_products)
+    )
+
+
+if __name__ == '__main__':
+    with Session(engine) as session:
+        reconcile_category_counts(session)
+        session.commit()
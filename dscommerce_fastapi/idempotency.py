@@ -0,0 +1,150 @@
+import hashlib
+from datetime import timedelta
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import Depends, Header, HTTPException, Response
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from dscommerce_fastapi.database import engine, get_session
+from dscommerce_fastapi.db import utcnow
+from dscommerce_fastapi.db.models.idempotency import IdempotencyKey
+from dscommerce_fastapi.responses import JSON_MEDIA_TYPE
+from dscommerce_fastapi.settings import Settings
+
+settings = Settings()
+
+# avisa o cliente que a resposta veio guardada de uma requisição anterior
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# quantas chaves vencidas são apagadas por vez (e por transação)
+IDEMPOTENCY_CLEANUP_BATCH_SIZE = 1000
+
+
+def request_hash(scope: str, body: str) -> str:
+    return hashlib.sha256(f'{scope}\n{body}'.encode()).hexdigest()
+
+
+def _replay(stored: IdempotencyKey) -> Response:
+    return Response(
+        content=stored.response_body,
+        status_code=stored.status_code,
+        media_type=JSON_MEDIA_TYPE,
+        headers={REPLAYED_HEADER: 'true'},
+    )
+
+
+# POST com Idempotency-Key: o retry com a mesma chave é respondido com a
+# resposta guardada, sem rodar a escrita de novo. A resposta é gravada na
+# mesma transação da escrita, então ou as duas ficam ou nenhuma fica
+class IdempotentRequest:
+    def __init__(self, session: Session, key: str | None):
+        self.session = session
+        self.key = key
+        self.user_id: int | None = None
+        self.request_hash: str | None = None
+
+    def _stored(self) -> IdempotencyKey | None:
+        return self.session.get(IdempotencyKey, (self.user_id, self.key))
+
+    # uma busca pela chave primária, devolve a resposta guardada se for
+    # retry ou None se a requisição tem que rodar
+    def replay(self, user_id: int, scope: str, data) -> Response | None:
+        if self.key is None:
+            return None
+
+        self.user_id = user_id
+        self.request_hash = request_hash(scope, data.model_dump_json())
+
+        stored = self._stored()
+        if stored is None:
+            return None
+        # vencida é como se não existisse, sai pra dar lugar à nova
+        if stored.expires_at <= utcnow():
+            self.session.delete(stored)
+            return None
+        return self._replay(stored)
+
+    # a mesma chave com outro corpo não é retry, é erro do cliente
+    def _replay(self, stored: IdempotencyKey) -> Response:
+        if stored.request_hash != self.request_hash:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail='Idempotency-Key already used with a different request',
+            )
+        return _replay(stored)
+
+    # grava a resposta junto e commita. Se outra requisição com a mesma
+    # chave commitou antes (corrida entre retries), a chave primária
+    # barra essa e a resposta é a que ficou gravada (se for o mesmo corpo)
+    def commit(self, response: Response) -> Response:
+        if self.key is not None:
+            now = utcnow()
+            self.session.add(
+                IdempotencyKey(
+                    user_id=self.user_id,
+                    key=self.key,
+                    request_hash=self.request_hash,
+                    status_code=response.status_code,
+                    response_body=response.body.decode(),
+                    created_at=now,
+                    expires_at=now
+                    + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                )
+            )
+
+        try:
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            stored = self.key is not None and self._stored()
+            if not stored:
+                raise
+            return self._replay(stored)
+
+        return response
+
+
+def get_idempotent_request(
+    session: Session = Depends(get_session),
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+):
+    return IdempotentRequest(session, idempotency_key)
+
+
+# apaga as chaves vencidas em lotes, um commit por lote pra não segurar
+# uma transação longa nem travar a tabela inteira
+def cleanup_idempotency_keys(
+    session, batch_size: int = IDEMPOTENCY_CLEANUP_BATCH_SIZE
+) -> int:
+    now = utcnow()
+    deleted = 0
+    while True:
+        batch = session.execute(
+            select(IdempotencyKey.user_id, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= now)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+
+        session.execute(
+            delete(IdempotencyKey)
+            .where(
+                tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(batch)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        deleted += len(batch)
+
+        if len(batch) < batch_size:
+            break
+
+    return deleted
+
+
+if __name__ == '__main__':
+    with Session(engine) as session:
+        cleanup_idempotency_keys(session)
@@ -0,0 +1,116 @@
+from typing import List
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from sqlalchemy import bindparam, select, update
+
+from dscommerce_fastapi.db.models.products import (
+    Product,
+    ProductCategoryAssociation,
+)
+
+# quantos produtos da categoria são reescritos por UPDATE (executemany)
+LISTING_CHUNK_SIZE = 1000
+
+
+# reescreve listing_categories de todos os produtos de uma categoria, em
+# chunks pelo id (keyset), com um UPDATE em lote por chunk, sem carregar os
+# produtos no ORM. Não commita, fica na transação de quem chamou
+def _rewrite_listing(session, category_id: int, rewrite):
+    products = Product.__table__
+    statement = (
+        update(products)
+        .where(products.c.id == bindparam('b_id'))
+        .values(
+            listing_categories=bindparam('b_listing_categories'),
+            # a representação do produto mudou, então muda a ETag também
+            version=products.c.version + 1,
+        )
+    )
+
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(products.c.id, products.c.listing_categories)
+            .join(
+                ProductCategoryAssociation,
+                ProductCategoryAssociation.c.product_id == products.c.id,
+            )
+            .where(
+                ProductCategoryAssociation.c.category_id == category_id,
+                products.c.id > last_id,
+            )
+            .order_by(products.c.id)
+            .limit(LISTING_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        session.execute(
+            statement,
+            [
+                {
+                    'b_id': id,
+                    'b_listing_categories': rewrite(listing_categories),
+                }
+                for id, listing_categories in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def rename_category_in_listing(session, category_id: int, name: str):
+    _rewrite_listing(
+        session,
+        category_id,
+        lambda categories: [
+            {**c, 'name': name} if c['id'] == category_id else c
+            for c in categories
+        ],
+    )
+
+
+def remove_category_from_listing(session, category_id: int):
+    _rewrite_listing(
+        session,
+        category_id,
+        lambda categories: [c for c in categories if c['id'] != category_id],
+    )
+
+
+# -------- schemas da listagem --------
+# a resposta de produto que sai do listing_categories, usada por
+# /products e por /categories/{id}/products
+
+
+class CategoryRead(BaseModel):
+    id: int
+    name: str
+
+    # acho que não precisa, testar depois
+    model_config = ConfigDict(from_attributes=True)
+
+
+# retornar
+class ProductRead(BaseModel):
+    id: int
+    name: str
+    serial_code: str
+    description: str | None = None
+    price: float
+    img_url: str
+    categories: List[CategoryRead]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# mesma resposta do ProductRead, mas as categorias vêm da cópia
+# desnormalizada (products.listing_categories), sem tocar em product_category
+class ProductListingRead(ProductRead):
+    categories: List[CategoryRead] = Field(
+        validation_alias='listing_categories'
+    )
+
+
+# usados pra serializar direto pra bytes as respostas que vão pro cache
+product_adapter = TypeAdapter(ProductListingRead)
+product_list_adapter = TypeAdapter(list[ProductListingRead])
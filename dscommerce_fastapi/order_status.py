@@ -0,0 +1,57 @@
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from dscommerce_fastapi.db.models.orders import Order
+
+OrderStatus = Order.OrderStatus
+
+# pra quais status cada status pode ir, o que não está aqui não é permitido
+# (DELIVERED e CANCELED são finais)
+ORDER_TRANSITIONS: dict[OrderStatus, frozenset[OrderStatus]] = {
+    OrderStatus.WAITING_PAYMENT: frozenset({
+        OrderStatus.PAID,
+        OrderStatus.CANCELED,
+    }),
+    OrderStatus.PAID: frozenset({OrderStatus.SHIPPED, OrderStatus.CANCELED}),
+    OrderStatus.SHIPPED: frozenset({OrderStatus.DELIVERED}),
+    OrderStatus.DELIVERED: frozenset(),
+    OrderStatus.CANCELED: frozenset(),
+}
+
+
+def can_transition(current: OrderStatus, new: OrderStatus) -> bool:
+    return new in ORDER_TRANSITIONS[current]
+
+
+# troca o status do pedido com um UPDATE ... WHERE id = :id AND status =
+# :esperado, sem SELECT ... FOR UPDATE. Se outra requisição trocou o status
+# depois que o pedido foi lido (pagamento e cancelamento ao mesmo tempo),
+# o UPDATE não acha a linha e essa requisição perde, sem ninguém esperar
+# lock. Não commita, a troca vai junto com o resto da transação
+def transition_order(session, order: Order, new_status: OrderStatus):
+    expected = order.status
+    if not can_transition(expected, new_status):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=(
+                f'Order cannot change from {expected.value} '
+                f'to {new_status.value}'
+            ),
+        )
+
+    result = session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == expected)
+        .values(status=new_status, version=Order.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail='Order status was changed by another request',
+        )
+
+    # o objeto da sessão ainda tem o status/version de antes do UPDATE
+    session.expire(order, ['status', 'version'])
@@ -0,0 +1,40 @@
+import base64
+import json
+from http import HTTPStatus
+
+from fastapi import HTTPException
+
+# header onde a próxima página é informada, assim o corpo da resposta
+# continua sendo só a lista e quem usa offset não quebra
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+# o cursor é opaco pro cliente, por dentro é só um JSON com os valores
+# da chave de ordenação do último item da página, ex: [id]
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+# types é o tipo esperado de cada valor, na mesma ordem do encode_cursor
+def decode_cursor(cursor: str, *types) -> list:
+    invalid_cursor = HTTPException(
+        status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+    )
+
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    # binascii.Error e JSONDecodeError são subclasses de ValueError
+    except ValueError:
+        raise invalid_cursor
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise invalid_cursor
+
+    for value, type_ in zip(values, types):
+        # bool é subclasse de int, então precisa barrar separado
+        if isinstance(value, bool) or not isinstance(value, type_):
+            raise invalid_cursor
+
+    return values
@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from dscommerce_fastapi.category_registry import category_registry
+from dscommerce_fastapi.database import get_session
+from dscommerce_fastapi.db.models.categories import Category
+
+
+# resolve categorias ativas pelo id primeiro pelo category_registry (sem ir
+# no banco) e só o que não estiver lá com uma query só (IN), guardando o
+# resultado, então pedir as mesmas categorias de novo na mesma requisição
+# não vai pro banco
+class CategoryResolver:
+    def __init__(self, session: Session):
+        self.session = session
+        self._active: dict[int, Category] = {}
+        self._missing: set[int] = set()
+        # id e nome copiados no carregamento, pra montar listing_categories
+        # mesmo depois de um commit ter expirado os objetos
+        self._listing: dict[int, dict] = {}
+
+    def _add(self, category: Category):
+        self._active[category.id] = category
+        self._listing[category.id] = {
+            'id': category.id,
+            'name': category.name,
+        }
+
+    # categoria do registry vira um objeto da sessão sem SELECT: se a
+    # sessão já tem ela usa a mesma, senão cria uma já "persistida" só com
+    # id, nome e is_active (o resto carrega se alguém acessar)
+    def _attach(self, entry) -> Category:
+        category = self.session.identity_map.get(
+            identity_key(Category, entry.id)
+        )
+        if category is None:
+            category = Category(id=entry.id, name=entry.name, is_active=True)
+            make_transient_to_detached(category)
+            self.session.add(category)
+        return category
+
+    # retorna só as que existem e estão ativas, sem dar erro
+    def load(self, ids) -> dict[int, Category]:
+        pending = {
+            id
+            for id in ids
+            if id not in self._active and id not in self._missing
+        }
+        if pending:
+            snapshot = category_registry.get(self.session)
+            for id in pending & snapshot.by_id.keys():
+                self._add(self._attach(snapshot.by_id[id]))
+            pending -= self._active.keys()
+
+        # o que não está na foto pode ter sido criado por outro processo
+        # depois dela, então confere no banco
+        if pending:
+            query = select(Category).where(
+                Category.id.in_(pending), Category.is_active
+            )
+            for category in self.session.scalars(query):
+                self._add(category)
+            self._missing.update(pending - self._active.keys())
+
+        return {id: self._active[id] for id in ids if id in self._active}
+
+    # igual o load, mas se faltar alguma da erro listando todas que faltam
+    def resolve(self, ids) -> list[Category]:
+        # dict.fromkeys remove ids repetidos mantendo a ordem
+        ids = list(dict.fromkeys(ids))
+        found = self.load(ids)
+
+        missing = [id for id in ids if id not in found]
+        if missing:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail=f'Category not found: {missing}',
+            )
+
+        return [found[id] for id in ids]
+
+    # representação das categorias (já carregadas) como fica no
+    # products.listing_categories
+    def listing(self, ids) -> list[dict]:
+        ids = dict.fromkeys(ids)
+        return [self._listing[id] for id in ids if id in self._listing]
+
+
+# como o get_session é cacheado por requisição pelo FastAPI, o resolver
+# também é um só por requisição, compartilhado por quem depender dele
+def get_category_resolver(session: Session = Depends(get_session)):
+    return CategoryResolver(session)
@@ -0,0 +1,23 @@
+from http import HTTPStatus
+
+from fastapi import Response
+
+JSON_MEDIA_TYPE = 'application/json'
+
+
+# caminho rápido de resposta: o TypeAdapter é criado uma vez só (no import
+# do router), valida direto dos objetos do ORM e o dump_json já gera os
+# bytes no pydantic-core, sem passar pelo jsonable_encoder + json.dumps.
+# Como a rota devolve um Response, o FastAPI não valida de novo pelo
+# response_model, que fica só pra documentação
+def json_response(
+    adapter, value, status_code=HTTPStatus.OK, headers=None
+) -> Response:
+    return Response(
+        content=adapter.dump_json(
+            adapter.validate_python(value, from_attributes=True)
+        ),
+        status_code=status_code,
+        media_type=JSON_MEDIA_TYPE,
+        headers=headers,
+    )
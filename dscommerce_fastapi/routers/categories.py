@@ -2,15 +2,40 @@ from datetime import UTC, datetime
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
-from sqlalchemy.orm import Session, selectinload
-
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from dscommerce_fastapi.cache import invalidate_catalog
+from dscommerce_fastapi.category_registry import category_registry
+from dscommerce_fastapi.category_tree import (
+    move_category,
+    remove_category_from_tree,
+)
 from dscommerce_fastapi.database import get_session
 from dscommerce_fastapi.db.models.categories import Category
-from dscommerce_fastapi.db.models.products import Product
+from dscommerce_fastapi.db.models.products import (
+    Product,
+    ProductCategoryAssociation,
+)
 from dscommerce_fastapi.db.models.users import User
+from dscommerce_fastapi.listing import (
+    ProductRead,
+    product_list_adapter,
+    remove_category_from_listing,
+    rename_category_in_listing,
+)
+from dscommerce_fastapi.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+)
+from dscommerce_fastapi.resolvers import (
+    CategoryResolver,
+    get_category_resolver,
+)
+from dscommerce_fastapi.responses import json_response
 from dscommerce_fastapi.schemas import Message
 from dscommerce_fastapi.security import get_current_user
 
@@ -18,15 +43,22 @@ router = APIRouter(prefix='/categories', tags=['categories'])
 
 T_Session = Annotated['Session', Depends(get_session)]
 T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_CategoryResolver = Annotated[
+    CategoryResolver, Depends(get_category_resolver)
+]
 
 
 class CategoryCreate(BaseModel):
     name: str
+    # categoria pai, sem ela a categoria fica na raiz
+    parent_id: int | None = None
 
 
 class CategoryRead(BaseModel):
     id: int
     name: str
+    parent_id: int | None = None
+    product_count: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -35,10 +67,28 @@ class ListCategoryRead(BaseModel):
     categories: list[CategoryRead]
 
 
+category_list_adapter = TypeAdapter(ListCategoryRead)
+
+
+def get_parent_category(db, parent_id: int) -> Category:
+    parent = db.scalar(
+        select(Category).where(Category.id == parent_id, Category.is_active)
+    )
+    if not parent:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail='Parent category not found',
+        )
+    return parent
+
+
 @router.post('', status_code=HTTPStatus.CREATED, response_model=CategoryRead)
 def create_category(
     data: CategoryCreate, db: T_Session, current_user: T_CurrentUser
 ):
+    if data.parent_id is not None:
+        get_parent_category(db, data.parent_id)
+
     db_category = Category(
         created_by=current_user, **data.model_dump(exclude_unset=True)
     )
@@ -52,26 +102,120 @@ def create_category(
 
 @router.get('', status_code=HTTPStatus.OK, response_model=ListCategoryRead)
 def read_categories(
-    db: T_Session, name: str | None = None, limit=10, offset=0
+    db: T_Session,
+    name: str | None = None,
+    limit: Annotated[int, Query(ge=0)] = 10,
+    offset: Annotated[int, Query(ge=0)] = 0,
 ):
-    query = (
-        select(Category).limit(limit).offset(offset).where(Category.is_active)
-    )
+    # as categorias ativas saem do category_registry (memória do processo),
+    # que só vai no banco quando alguma categoria mudou
+    categories = category_registry.get(db).by_id.values()
 
     if name:
-        # contais é o %LIKE%
-        query = query.filter(Category.name.contains(name))
-        # apenas uma maneira de fazer oq foi feito no name acima,
-        # poderia ser f'{name}%' ou f'%{name}' também
-        # query = query.filter(Category.name.like(f'%{name}%'))
-        # query = query.where(Category.name.like(f'%{name}%'))
-    db_categories = db.scalars(query).all()
+        # mesmo que o contains (%LIKE%) que era feito no banco, que no
+        # sqlite não diferencia maiúsculas de minúsculas
+        name = name.casefold()
+        categories = [c for c in categories if name in c.name.casefold()]
+
+    page = list(categories)[offset : offset + limit]
+
+    # o product_count muda a cada produto criado/removido, então não fica na
+    # foto, vem de uma query pela chave primária das categorias da página
+    counts = dict(
+        db.execute(
+            select(Category.id, Category.product_count).where(
+                Category.id.in_([c.id for c in page])
+            )
+        ).all()
+    )
+    db_categories = [
+        {
+            'id': c.id,
+            'name': c.name,
+            'parent_id': c.parent_id,
+            'product_count': counts.get(c.id, 0),
+        }
+        for c in page
+    ]
+
+    return json_response(category_list_adapter, {'categories': db_categories})
+
+
+class CategoryRegistryStats(BaseModel):
+    version: int
+    size: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+# precisa vir antes do GET /{category_id}, senão 'registry' cai lá como id
+@router.get(
+    '/registry',
+    status_code=HTTPStatus.OK,
+    response_model=CategoryRegistryStats,
+)
+def read_category_registry_stats(current_user: T_CurrentUser):
+    return category_registry.stats()
 
-    return {'categories': db_categories}
+
+# produtos ligados direto à categoria (sem as subcategorias, pra isso tem o
+# GET /products?category_id=), paginados por cursor pelo índice
+# (category_id, product_id) de product_category
+@router.get(
+    '/{category_id}/products',
+    status_code=HTTPStatus.OK,
+    response_model=list[ProductRead],
+)
+def read_category_products(
+    category_id: int,
+    db: T_Session,
+    categories: T_CategoryResolver,
+    limit: int = 10,
+    # valor de X-Next-Cursor da página anterior
+    cursor: str | None = None,
+):
+    # normalmente sai do category_registry, sem ir no banco
+    if not categories.load([category_id]):
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Category not found'
+        )
+
+    link = ProductCategoryAssociation.c
+    query = (
+        select(Product)
+        .join(ProductCategoryAssociation, link.product_id == Product.id)
+        .where(link.category_id == category_id, Product.is_active)
+        .order_by(link.product_id)
+        .limit(limit)
+    )
+    if cursor:
+        # o cursor leva a categoria junto, assim um cursor de outra
+        # categoria ou de outra listagem (ex: /products) dá 400
+        cursor_category_id, last_id = decode_cursor(cursor, int, int)
+        if cursor_category_id != category_id:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+            )
+        query = query.where(link.product_id > last_id)
+
+    # as categorias de cada produto vêm do listing_categories da própria
+    # linha, então a página inteira é uma query só
+    db_products = db.scalars(query).all()
+
+    headers = {}
+    # se a página veio cheia pode ter mais, então manda o cursor da próxima
+    if db_products and len(db_products) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            category_id, db_products[-1].id
+        )
+
+    return json_response(product_list_adapter, db_products, headers=headers)
 
 
 class CategoryUpdate(BaseModel):
     name: str | None = None
+    parent_id: int | None = None
 
 
 @router.patch(
@@ -105,10 +249,25 @@ def update_category(
 
     if data.name:
         db_category.name = data.name
+        # o nome também fica copiado em cada produto (listing_categories)
+        rename_category_in_listing(db, db_category.id, data.name)
+
+    # parent_id null manda a categoria pra raiz, sem o campo não mexe
+    if (
+        'parent_id' in data.model_fields_set
+        and data.parent_id != db_category.parent_id
+    ):
+        if data.parent_id is not None:
+            get_parent_category(db, data.parent_id)
+        move_category(db, db_category, data.parent_id)
 
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+
+    # o nome da categoria vai dentro de cada produto em cache
+    invalidate_catalog()
+
     return db_category
 
 
@@ -166,11 +325,30 @@ def delete_category(
     # for product in db_products:
     #     product.categories.remove(db_category)
 
+    # o jeito acima carregava todos os produtos da categoria e removia um
+    # vínculo por vez, agora o listing_categories é reescrito em chunks e os
+    # vínculos saem com um DELETE só, sem trazer produto nenhum pro python.
+    # A chave primária de product_category começa pelo product_id, quem
+    # acha as linhas da categoria é o ix_product_category_category_id_
+    # product_id; sem ele esse DELETE varre a tabela inteira
+    remove_category_from_listing(db, db_category.id)
+    db.execute(
+        delete(ProductCategoryAssociation).where(
+            ProductCategoryAssociation.c.category_id == db_category.id
+        )
+    )
+    # os filhos sobem pro pai dela
+    remove_category_from_tree(db, db_category)
+
     db_category.is_active = False
+    db_category.product_count = 0
     db_category.deleted_at = datetime.now(UTC)
     # poderia ser só o id?
     # db_category.deleted_by_id = current_user.id
     db_category.deleted_by = current_user
     # db.delete(db_category)
     db.commit()
+
+    invalidate_catalog()
+
     return {'message': 'Category deleted successfully'}
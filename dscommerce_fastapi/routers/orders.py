@@ -3,25 +3,47 @@ from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import insert, literal, select, tuple_
 from sqlalchemy.orm import Session, joinedload, selectinload
 
+from dscommerce_fastapi.archive import get_archived_order
 from dscommerce_fastapi.database import get_session
+from dscommerce_fastapi.db.models.order_item import OrderItem
 from dscommerce_fastapi.db.models.orders import Order
 from dscommerce_fastapi.db.models.products import Product
 from dscommerce_fastapi.db.models.users import User
+from dscommerce_fastapi.idempotency import (
+    IdempotentRequest,
+    get_idempotent_request,
+)
+from dscommerce_fastapi.order_status import transition_order
+from dscommerce_fastapi.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+)
+from dscommerce_fastapi.responses import json_response
 from dscommerce_fastapi.schemas import Message
 from dscommerce_fastapi.security import get_current_user
+from dscommerce_fastapi.stock import release_stock, reserve_stock
 
 router = APIRouter(prefix='/orders', tags=['orders'])
 
 T_Session = Annotated['Session', Depends(get_session)]
 T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_IdempotentRequest = Annotated[
+    IdempotentRequest, Depends(get_idempotent_request)
+]
+
+
+class OrderItemCreate(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
 
 
 class OrderCreate(BaseModel):
-    products_ids: list[int]
+    items: list[OrderItemCreate] = Field(min_length=1)
 
 
 class UserRead(BaseModel):
@@ -34,6 +56,12 @@ class ProductRead(BaseModel):
     name: str
 
 
+class OrderItemRead(BaseModel):
+    product: ProductRead
+    quantity: int
+    unit_price: float
+
+
 class PaymentRead(BaseModel):
     id: int
     moment: datetime
@@ -43,60 +71,184 @@ class OrderRead(BaseModel):
     id: int
     status: Order.OrderStatus
     created_at: datetime
+    total_amount: float
+    item_count: int
     client: UserRead
-    products: list[ProductRead]
+    items: list[OrderItemRead] = Field(
+        validation_alias='order_products_association'
+    )
     payment: PaymentRead | None
 
 
+order_adapter = TypeAdapter(OrderRead)
+order_list_adapter = TypeAdapter(list[OrderRead])
+
+
 @router.post('', status_code=HTTPStatus.CREATED, response_model=OrderRead)
 def create_order(
-    session: T_Session, current_user: T_CurrentUser, data: OrderCreate
+    session: T_Session,
+    current_user: T_CurrentUser,
+    idempotent: T_IdempotentRequest,
+    data: OrderCreate,
 ):
-    query = select(Product).where(
-        Product.id.in_(data.products_ids), Product.is_active
-    )
-    products = session.scalars(query).all()
+    # retry de um pedido já criado (mesmo Idempotency-Key) não cria outro
+    replayed = idempotent.replay(current_user.id, 'POST /orders', data)
+    if replayed:
+        return replayed
 
-    # se o número for diferente, significa que algum produto não existe ou nao está ativo
-    if len(products) != len(data.products_ids):
+    # o mesmo produto em mais de uma linha vira uma linha só, somando as
+    # quantidades (dict mantém a ordem em que apareceu primeiro)
+    quantities: dict[int, int] = {}
+    for item in data.items:
+        quantities[item.product_id] = (
+            quantities.get(item.product_id, 0) + item.quantity
+        )
+
+    # o preço vai junto, ele fica copiado no item (unit_price), e o modo de
+    # estoque de cada produto pra reserva
+    query = select(
+        Product.id,
+        Product.name,
+        Product.price,
+        Product.stock,
+        Product.stock_shards,
+    ).where(Product.id.in_(quantities), Product.is_active)
+    products = {row.id: row for row in session.execute(query)}
+
+    # se faltar algum, ele não existe ou não está ativo
+    if len(products) != len(quantities):
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST, detail='Product not found'
         )
 
+    # sem estoque suficiente de algum o pedido nem é criado
+    reserved = reserve_stock(session, quantities, products)
+
+    # os totais vão no mesmo INSERT do pedido, calculados com o preço de agora
     db_order = Order(
-        client=current_user, status=Order.OrderStatus.WAITING_PAYMENT
+        client=current_user,
+        status=Order.OrderStatus.WAITING_PAYMENT,
+        total_amount=round(
+            sum(
+                products[id].price * quantity
+                for id, quantity in quantities.items()
+            ),
+            2,
+        ),
+        item_count=sum(quantities.values()),
     )
+    session.add(db_order)
+    # flush pra ter o id do pedido (o created_at o utcnow preenche junto)
+    session.flush()
 
-    db_order.products = products
+    # todos os itens num INSERT só (executemany), sem criar OrderItem
+    items = [
+        {
+            'order_id': db_order.id,
+            'product_id': id,
+            'quantity': quantity,
+            'unit_price': products[id].price,
+            # o que saiu do estoque, pro cancelamento devolver
+            'stock_reserved': id in reserved,
+            'stock_shard': reserved.get(id),
+        }
+        for id, quantity in quantities.items()
+    ]
+    session.execute(insert(OrderItem), items)
 
-    session.add(db_order)
-    session.commit()
+    # a resposta é montada antes do commit, que expira os objetos da
+    # sessão, com o que já está em memória, sem buscar o pedido de novo
+    # (e é ela que fica guardada pro Idempotency-Key)
+    order = {
+        'id': db_order.id,
+        'status': db_order.status,
+        'created_at': db_order.created_at,
+        'total_amount': db_order.total_amount,
+        'item_count': db_order.item_count,
+        'client': {'id': current_user.id, 'name': current_user.name},
+        'order_products_association': [
+            {
+                'product': {'id': id, 'name': products[id].name},
+                'quantity': quantity,
+                'unit_price': products[id].price,
+            }
+            for id, quantity in quantities.items()
+        ],
+        'payment': None,
+    }
 
-    return db_order
+    return idempotent.commit(
+        json_response(order_adapter, order, status_code=HTTPStatus.CREATED)
+    )
 
 
 @router.get('', status_code=HTTPStatus.OK, response_model=list[OrderRead])
-def read_orders(
+def read_orders(  # noqa: PLR0913, PLR0917
     session: T_Session,
     current_user: T_CurrentUser,
     limit: int = 10,
     offset: int = 0,
+    # cursor é o valor de X-Next-Cursor da página anterior, com ele o offset
+    # é ignorado e a busca começa direto depois do último pedido retornado
+    cursor: str | None = None,
+    status: Order.OrderStatus | None = None,
+    # intervalo de created_at, os dois inclusivos
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
 ):
+    # mais novo primeiro, na ordem do índice
+    # (client_id, created_at DESC, id DESC)
     query = (
         select(Order)
         .options(
             joinedload(Order.client),
             joinedload(Order.payment),
-            selectinload(Order.products),
+            # itens da página inteira num SELECT ... IN só
+            selectinload(Order.order_products_association).joinedload(
+                OrderItem.product
+            ),
         )
         .where(Order.client_id == current_user.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
         .limit(limit)
-        .offset(offset)
     )
 
+    if status:
+        query = query.where(Order.status == status)
+
+    if created_from:
+        query = query.where(Order.created_at >= created_from)
+
+    if created_to:
+        query = query.where(Order.created_at <= created_to)
+
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, str, int)
+        try:
+            last_created_at = datetime.fromisoformat(last_created_at)
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+            )
+        # o valor do cursor vai com o tipo da coluna, assim é convertido e
+        # comparado no mesmo formato do created_at gravado (utcnow)
+        query = query.where(
+            tuple_(Order.created_at, Order.id)
+            < tuple_(literal(last_created_at, Order.created_at.type), last_id)
+        )
+    else:
+        query = query.offset(offset)
+
     orders = session.scalars(query).all()
 
-    return orders
+    headers = {}
+    # se a página veio cheia pode ter mais, então manda o cursor da próxima
+    if orders and len(orders) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            orders[-1].created_at, orders[-1].id
+        )
+
+    return json_response(order_list_adapter, orders, headers=headers)
 
 
 @router.get('/{order_id}', status_code=HTTPStatus.OK, response_model=OrderRead)
@@ -106,16 +258,47 @@ def get_order(order_id: int, session: T_Session, current_user: T_CurrentUser):
         .options(
             joinedload(Order.client),
             joinedload(Order.payment),
-            selectinload(Order.products),
+            selectinload(Order.order_products_association).joinedload(
+                OrderItem.product
+            ),
         )
         .where(Order.id == order_id, Order.client_id == current_user.id)
     )
 
     order = session.scalar(query)
 
+    if not order:
+        # pedido finalizado antigo já pode ter ido pras tabelas de arquivo
+        archived = get_archived_order(session, order_id, current_user.id)
+        if not archived:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail='Order not found'
+            )
+        return json_response(order_adapter, archived)
+
+    return order
+
+
+@router.post(
+    '/{order_id}/cancel', status_code=HTTPStatus.OK, response_model=Message
+)
+def cancel_order(
+    order_id: int, session: T_Session, current_user: T_CurrentUser
+):
+    query = select(Order).where(
+        Order.id == order_id, Order.client_id == current_user.id
+    )
+    order = session.scalar(query)
+
     if not order:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Order not found'
         )
 
-    return order
+    # se um pagamento trocar o status no meio, o cancelamento não se perde
+    # por cima dele, dá erro e o cliente vê o status novo
+    transition_order(session, order, Order.OrderStatus.CANCELED)
+    release_stock(session, order.id)
+    session.commit()
+
+    return {'message': 'Order canceled successfully'}
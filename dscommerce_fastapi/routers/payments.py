@@ -3,7 +3,7 @@ from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import AliasPath, BaseModel, Field, TypeAdapter
 from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 
@@ -11,6 +11,12 @@ from dscommerce_fastapi.database import get_session
 from dscommerce_fastapi.db.models.orders import Order
 from dscommerce_fastapi.db.models.payment import Payment
 from dscommerce_fastapi.db.models.users import User
+from dscommerce_fastapi.idempotency import (
+    IdempotentRequest,
+    get_idempotent_request,
+)
+from dscommerce_fastapi.order_status import transition_order
+from dscommerce_fastapi.responses import json_response
 from dscommerce_fastapi.schemas import Message
 from dscommerce_fastapi.security import get_current_user
 
@@ -18,20 +24,34 @@ router = APIRouter(prefix='/payments', tags=['payments'])
 
 T_Session = Annotated['Session', Depends(get_session)]
 T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_IdempotentRequest = Annotated[
+    IdempotentRequest, Depends(get_idempotent_request)
+]
 
 
 class PaymentCreate(BaseModel):
     order_id: int
 
 
+message_adapter = TypeAdapter(Message)
+
+
 # @router.post('/{order_id}', status_code=HTTPStatus.CREATED, response_model=Message)
 # def create_payment(
 #     order_id: int, session: T_Session, current_user: T_CurrentUser, data: PaymentCreate
 # ):
 @router.post('', status_code=HTTPStatus.CREATED, response_model=Message)
 def create_payment(
-    session: T_Session, current_user: T_CurrentUser, data: PaymentCreate
+    session: T_Session,
+    current_user: T_CurrentUser,
+    idempotent: T_IdempotentRequest,
+    data: PaymentCreate,
 ):
+    # retry de um pagamento já feito (mesmo Idempotency-Key) não paga de novo
+    replayed = idempotent.replay(current_user.id, 'POST /payments', data)
+    if replayed:
+        return replayed
+
     query = select(Order).where(
         Order.id == data.order_id, Order.client_id == current_user.id
     )
@@ -41,14 +61,24 @@ def create_payment(
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Order not found'
         )
+
+    # só paga se ainda estiver WAITING_PAYMENT, com UPDATE condicional: de
+    # dois pagamentos ao mesmo tempo (ou um retry sem Idempotency-Key) só
+    # um acha o pedido esperando pagamento, o outro recebe erro
+    transition_order(session, order, Order.OrderStatus.PAID)
+
     # aqui ele tá associando o Payment ao objeto Order que também já está monitorado pelo ORM,
     #  então não precisa fazer order.payment = Payment(order=order)
     payment = Payment(order=order)
-    order.status = Order.OrderStatus.PAID
     session.add(payment)
-    session.commit()
 
-    return {'message': 'Payment created successfully'}
+    return idempotent.commit(
+        json_response(
+            message_adapter,
+            {'message': 'Payment created successfully'},
+            status_code=HTTPStatus.CREATED,
+        )
+    )
 
 
 class UserRead(BaseModel):
@@ -68,8 +98,12 @@ class PaymentRead(BaseModel):
     moment: datetime
     order: OrderRead
     # o client está em Order, mas vou colocar aqui pra ter 1 nível só de JSON,
-    # então tenho que montar a resposta do JSON na mão ao invés dele já saber fazer se fosse em OrderRead
-    client: UserRead
+    # o AliasPath busca ele em payment.order.client, sem montar na mão
+    client: UserRead = Field(validation_alias=AliasPath('order', 'client'))
+
+
+payment_adapter = TypeAdapter(PaymentRead)
+payment_list_adapter = TypeAdapter(list[PaymentRead])
 
 
 @router.get(
@@ -96,22 +130,7 @@ def get_payment(
             status_code=HTTPStatus.NOT_FOUND, detail='Payment not found'
         )
 
-    # se client tivesse em OrderRead, era só retornar payment (return payment)
-    # pois estaria aninhado certo, mas como quero que client esteja no mesmo nível de Order, tem que montar a resposta manual
-
-    response = PaymentRead(
-        id=payment.id,
-        moment=payment.moment,
-        order=OrderRead(
-            id=payment.order.id,
-            status=payment.order.status,
-            created_at=payment.order.created_at,
-        ),
-        client=UserRead(
-            id=payment.order.client.id, name=payment.order.client.name
-        ),
-    )
-    return response
+    return json_response(payment_adapter, payment)
 
 
 @router.get('', status_code=HTTPStatus.OK, response_model=list[PaymentRead])
@@ -125,20 +144,4 @@ def read_payments(session: T_Session, current_user: T_CurrentUser):
 
     payments = session.scalars(query).all()
 
-    response = [
-        PaymentRead(
-            id=payment.id,
-            moment=payment.moment,
-            order=OrderRead(
-                id=payment.order.id,
-                status=payment.order.status,
-                created_at=payment.order.created_at,
-            ),
-            client=UserRead(
-                id=payment.order.client.id, name=payment.order.client.name
-            ),
-        )
-        for payment in payments
-    ]
-
-    return response
+    return json_response(payment_list_adapter, payments)
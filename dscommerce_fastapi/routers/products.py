@@ -1,22 +1,86 @@
+import csv
+import io
+from datetime import datetime
 from http import HTTPStatus
-from typing import Annotated, List
-
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
-from sqlalchemy.orm import Session, joinedload, selectinload
-
+from typing import Annotated, List, Literal
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session, selectinload
+
+from dscommerce_fastapi.bulk_import import (
+    BULK_CHUNK_SIZE,
+    CSV_CATEGORIES_SEPARATOR,
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    import_chunk,
+    iter_lines,
+    iter_records,
+    validate_record,
+)
+from dscommerce_fastapi.bulk_update import (
+    BULK_UPDATE_CHUNK_SIZE,
+    delete_chunk,
+    update_chunk,
+)
+from dscommerce_fastapi.cache import (
+    PRODUCT_LIST_NAMESPACE,
+    PRODUCT_NAMESPACE,
+    CachedResponse,
+    invalidate_product,
+    product_cache,
+)
+from dscommerce_fastapi.category_tree import subtree_products_ids
 from dscommerce_fastapi.database import get_session
-from dscommerce_fastapi.db.models.categories import Category
-from dscommerce_fastapi.db.models.products import Product
+from dscommerce_fastapi.db.models.products import (
+    Product,
+    ProductCategoryAssociation,
+)
 from dscommerce_fastapi.db.models.users import User
+from dscommerce_fastapi.etag import etag_matches, make_etag, not_modified
+from dscommerce_fastapi.facets import (
+    count_categories,
+    increment_category_counts,
+)
+from dscommerce_fastapi.listing import (
+    ProductListingRead,
+    ProductRead,
+    product_adapter,
+    product_list_adapter,
+)
+from dscommerce_fastapi.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+)
+from dscommerce_fastapi.resolvers import (
+    CategoryResolver,
+    get_category_resolver,
+)
+from dscommerce_fastapi.responses import json_response
 from dscommerce_fastapi.schemas import Message
+from dscommerce_fastapi.search import apply_search, index_products
 from dscommerce_fastapi.security import get_current_user
+from dscommerce_fastapi.stock import MAX_STOCK_SHARDS, set_stock, stock_level
 
 router = APIRouter(prefix='/products', tags=['products'])
 
 T_Session = Annotated['Session', Depends(get_session)]
 T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_CategoryResolver = Annotated[
+    CategoryResolver, Depends(get_category_resolver)
+]
+T_IfNoneMatch = Annotated[str | None, Header()]
 
 
 # receber
@@ -32,32 +96,31 @@ class ProductCreate(BaseModel):
     # daria pra fazer outro endpoint que recebe a categoria
     # como se fosse objeto mesmo, ou seja, id e nome, igual Category Read
     categories_ids: List[int]
+    # sem stock o produto não tem controle de estoque
+    stock: int | None = Field(default=None, ge=0)
 
 
-class CategoryRead(BaseModel):
-    id: int
-    name: str
-
-    # acho que não precisa, testar depois
-    model_config = ConfigDict(from_attributes=True)
-
+def cached_json_response(cached: CachedResponse):
+    return Response(
+        content=cached.body,
+        media_type='application/json',
+        headers=cached.headers,
+    )
 
-# retornar
-class ProductRead(BaseModel):
-    id: int
-    name: str
-    serial_code: str
-    description: str | None = None
-    price: float
-    img_url: str
-    categories: List[CategoryRead]
 
-    model_config = ConfigDict(from_attributes=True)
+# a ETag de um produto muda quando a linha dele muda (version/updated_at),
+# e renomear/remover uma categoria reescreve listing_categories dos produtos
+# dela incrementando a version, então não precisa olhar as categorias
+def product_etag_parts(product):
+    return (product.id, product.version, product.updated_at)
 
 
 @router.post('', status_code=HTTPStatus.CREATED, response_model=ProductRead)
 def create_product(
-    data: ProductCreate, db: T_Session, current_user: T_CurrentUser
+    data: ProductCreate,
+    db: T_Session,
+    current_user: T_CurrentUser,
+    categories: T_CategoryResolver,
 ):
     query = select(Product).where(Product.serial_code == data.serial_code)
 
@@ -78,28 +141,133 @@ def create_product(
     )
     db_product.created_by = current_user
 
-    for category_id in data.categories_ids:
-        c = db.scalar(
-            select(Category).where(
-                Category.id == category_id, Category.is_active
-            )
-        )
-        if not c:
-            raise HTTPException(
-                status_code=HTTPStatus.NOT_FOUND, detail='Category not found'
-            )
-        db_product.categories.append(c)
+    # todas as categorias numa query só, se faltar alguma o erro já lista
+    # todas que faltam, ao invés de um select por categoria
+    db_product.categories.extend(categories.resolve(data.categories_ids))
 
     db.add(db_product)
+    # flush pra ter o id antes de indexar a busca textual
+    db.flush()
+    index_products(db, [db_product])
+    increment_category_counts(db, [c.id for c in db_product.categories])
     db.commit()
     db.refresh(db_product)
 
+    product_cache.invalidate(PRODUCT_LIST_NAMESPACE)
+
     return db_product
 
 
-@router.get('', status_code=HTTPStatus.OK, response_model=list[ProductRead])
+class BulkImportError(BaseModel):
+    row: int
+    detail: str
+
+
+class BulkImportResult(BaseModel):
+    created: int
+    errors: List[BulkImportError]
+
+
+# recebe NDJSON (um ProductCreate por linha) ou CSV (com cabeçalho e
+# categories_ids separados por |) em streaming, é async pra poder ler o
+# corpo aos poucos, e o acesso ao banco de cada chunk vai pro threadpool
+@router.post(
+    '/bulk', status_code=HTTPStatus.OK, response_model=BulkImportResult
+)
+async def bulk_create_products(
+    request: Request,
+    db: T_Session,
+    current_user: T_CurrentUser,
+    categories: T_CategoryResolver,
+):
+    media_type = request.headers.get('content-type', '').split(';')[0]
+    if media_type not in {NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE}:
+        raise HTTPException(
+            status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+            detail=f'Use {NDJSON_MEDIA_TYPE} or {CSV_MEDIA_TYPE}',
+        )
+
+    created = 0
+    errors = []
+    chunk = []
+
+    async def import_pending_chunk():
+        nonlocal created
+        chunk_created, chunk_errors = await run_in_threadpool(
+            import_chunk, db, chunk, current_user, categories
+        )
+        created += chunk_created
+        errors.extend(chunk_errors)
+        chunk.clear()
+        # cada chunk é commitado separado, então já aparece nas listagens
+        product_cache.invalidate(PRODUCT_LIST_NAMESPACE)
+
+    records = iter_records(iter_lines(request.stream()), media_type)
+    async for row, record in records:
+        if isinstance(record, str):
+            errors.append({'row': row, 'detail': record})
+            continue
+
+        data, error = validate_record(record, ProductCreate)
+        if error:
+            errors.append({'row': row, 'detail': error})
+            continue
+
+        chunk.append((row, data))
+        if len(chunk) == BULK_CHUNK_SIZE:
+            await import_pending_chunk()
+
+    if chunk:
+        await import_pending_chunk()
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'errors': errors}
+
+
+# colunas da ordenação da listagem (e do cursor), sempre terminando no id
+SORT_COLUMNS = {
+    'id': (Product.id,),
+    'price': (Product.price, Product.id),
+    'created_at': (Product.created_at, Product.id),
+    'name': (Product.name, Product.id),
+}
+# tipos dos valores de cada ordenação dentro do cursor (JSON)
+SORT_CURSOR_TYPES = {
+    'id': (int,),
+    'price': ((int, float), int),
+    'created_at': (str, int),
+    'name': (str, int),
+}
+
+
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    count: int
+
+
+class ProductFacets(BaseModel):
+    categories: List[CategoryFacet]
+
+
+# formato da listagem quando pede facetas, sem facetas continua sendo a lista
+class ProductSearchResult(BaseModel):
+    products: List[ProductRead]
+    facets: ProductFacets
+
+
+product_search_adapter = TypeAdapter(ProductSearchResult)
+
+
+@router.get(
+    '',
+    status_code=HTTPStatus.OK,
+    response_model=list[ProductRead] | ProductSearchResult,
+)
 def read_products(  # noqa#
     db: T_Session,
+    request: Request,
+    if_none_match: T_IfNoneMatch = None,
     # ao invés de vários parametros poderia fazer igual arbo
     # onde recebe uma classe com os parametros opcionais
     name: str | None = None,
@@ -108,34 +276,295 @@ def read_products(  # noqa#
     description: str | None = None,
     limit: int = 10,
     offset: int = 0,
+    # cursor é o valor de X-Next-Cursor da página anterior, com ele o offset
+    # é ignorado e a busca começa direto depois do último id retornado
+    cursor: str | None = None,
+    # busca textual em name e description, ordenada por relevância
+    q: str | None = None,
+    # facets=categories devolve também quantos produtos (do filtro todo,
+    # não só da página) tem em cada categoria
+    facets: Literal['categories'] | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    # com q a ordem é sempre por relevância, então sort/order são ignorados
+    sort: Literal['id', 'price', 'created_at', 'name'] = 'id',
+    order: Literal['asc', 'desc'] = 'asc',
+    # produtos da categoria e de todas as subcategorias dela
+    category_id: int | None = None,
 ):
-    # só de category estar no formato certo no ProductRead,
-    # basta o join que ele retorne tudo certinho
-    query = (
-        select(Product)
-        .options(selectinload(Product.categories))
-        .limit(limit)
-        .offset(offset)
-        .where(Product.is_active)
+    # a chave é a query string com os parâmetros ordenados, assim
+    # ?limit=2&offset=4 e ?offset=4&limit=2 caem na mesma entrada
+    cache_key = product_cache.key(
+        PRODUCT_LIST_NAMESPACE, str(sorted(request.query_params.multi_items()))
     )
+    cached = product_cache.get(cache_key)
+    if cached:
+        if etag_matches(if_none_match, cached.headers['ETag']):
+            return not_modified(cached.headers['ETag'])
+        return cached_json_response(cached)
+
+    if cursor and q:
+        # a ordem por relevância não é estável entre páginas,
+        # então busca textual só pagina por offset
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail='Cursor pagination is not supported with q',
+        )
+
+    # primeiro só os filtros, sem paginação, porque as facetas contam
+    # o conjunto filtrado inteiro e não só a página
+    # desempata pelo id, assim a ordem é estável e cada ordenação tem o
+    # índice (is_active, coluna, id) correspondente
+    sort_columns = SORT_COLUMNS[sort]
+    query = select(Product).where(Product.is_active)
+    if order == 'asc':
+        query = query.order_by(*(c.asc() for c in sort_columns))
+    else:
+        query = query.order_by(*(c.desc() for c in sort_columns))
+    filtered = False
 
     if name:
         query = query.where(Product.name.contains(name))
+        filtered = True
 
     if serial_code:
         query = query.filter(Product.serial_code.contains(serial_code))
+        filtered = True
 
     if price:
         query = query.where(Product.price == price)
+        filtered = True
+
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+        filtered = True
+
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+        filtered = True
 
     if description:
         # poderia ser f'{description}%' ou f'%{description}' também poderia ser
         # query = query.filter(Product.description.like(f'%{description}%'))
         query = query.where(Product.description.like(f'%{description}%'))
+        filtered = True
+
+    if category_id is not None:
+        query = query.where(Product.id.in_(subtree_products_ids(category_id)))
+        filtered = True
+
+    if q:
+        query = apply_search(query, db.get_bind().dialect.name, q)
+        filtered = True
+
+    facet_counts = None
+    if facets == 'categories':
+        products_ids = (
+            query.with_only_columns(Product.id).order_by(None)
+            if filtered
+            else None
+        )
+        facet_counts = count_categories(db, products_ids)
+
+    # as categorias saem do listing_categories da própria linha,
+    # então a página inteira é uma query só
+    query = query.limit(limit)
+
+    if cursor:
+        cursor_sort, cursor_order, *last_values = decode_cursor(
+            cursor, str, str, *SORT_CURSOR_TYPES[sort]
+        )
+        invalid_cursor = HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+        )
+        # o cursor só vale pra mesma ordenação em que foi gerado
+        if (cursor_sort, cursor_order) != (sort, order):
+            raise invalid_cursor
+        if sort == 'created_at':
+            try:
+                last_values[0] = datetime.fromisoformat(last_values[0])
+            except ValueError:
+                raise invalid_cursor
+
+        keyset = tuple_(*sort_columns)
+        if order == 'asc':
+            query = query.where(keyset > tuple_(*last_values))
+        else:
+            query = query.where(keyset < tuple_(*last_values))
+    else:
+        query = query.offset(offset)
 
     db_products = db.scalars(query).all()
 
-    return db_products
+    headers = {
+        'ETag': make_etag(
+            *(product_etag_parts(p) for p in db_products), facet_counts
+        )
+    }
+    # se a página veio cheia pode ter mais, então manda o cursor da próxima
+    if db_products and len(db_products) == limit and not q:
+        last = db_products[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            sort, order, *(getattr(last, c.key) for c in sort_columns)
+        )
+
+    if etag_matches(if_none_match, headers['ETag']):
+        return not_modified(headers['ETag'])
+
+    # serializa uma vez só e guarda os bytes, o hit do cache já devolve
+    # direto sem passar de novo pelo pydantic
+    products = product_list_adapter.validate_python(
+        db_products, from_attributes=True
+    )
+    if facet_counts is None:
+        body = product_list_adapter.dump_json(products)
+    else:
+        body = product_search_adapter.dump_json(
+            ProductSearchResult(
+                products=products,
+                facets=ProductFacets(categories=facet_counts),
+            )
+        )
+
+    cached = CachedResponse(body=body, headers=headers)
+    product_cache.set(cache_key, cached)
+
+    return cached_json_response(cached)
+
+
+# quantos produtos são carregados (e as categorias deles, numa query só)
+# por vez no export, é o que mantém a memória constante
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_CSV_HEADER = [
+    'id',
+    'name',
+    'serial_code',
+    'description',
+    'price',
+    'img_url',
+    'categories_ids',
+]
+
+
+def iter_products_export(bind, format: str):
+    # a sessão da requisição é fechada antes da resposta terminar de ser
+    # enviada, então o export abre a própria sessão no mesmo bind
+    with Session(bind) as session:
+        # yield_per liga o stream_results (cursor do lado do servidor) e
+        # entrega os produtos em partições, as categorias já vêm na linha
+        query = (
+            select(Product)
+            .where(Product.is_active)
+            .order_by(Product.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+
+        if format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_CSV_HEADER)
+            yield buffer.getvalue()
+
+        for products in session.scalars(query).partitions():
+            if format == 'ndjson':
+                yield b''.join(
+                    product_adapter.dump_json(
+                        product_adapter.validate_python(
+                            product, from_attributes=True
+                        )
+                    )
+                    + b'\n'
+                    for product in products
+                )
+                continue
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # mesmo formato aceito pelo POST /products/bulk
+            writer.writerows(
+                [
+                    product.id,
+                    product.name,
+                    product.serial_code,
+                    product.description or '',
+                    product.price,
+                    product.img_url,
+                    CSV_CATEGORIES_SEPARATOR.join(
+                        str(category['id'])
+                        for category in product.listing_categories
+                    ),
+                ]
+                for product in products
+            )
+            yield buffer.getvalue()
+
+
+# precisa vir antes do GET /{product_id}, senão 'export' cai lá como id
+@router.get('/export', status_code=HTTPStatus.OK)
+def export_products(
+    db: T_Session,
+    current_user: T_CurrentUser,
+    format: Literal['ndjson', 'csv'] = 'ndjson',
+):
+    media_type = NDJSON_MEDIA_TYPE if format == 'ndjson' else CSV_MEDIA_TYPE
+    return StreamingResponse(
+        iter_products_export(db.get_bind(), format),
+        media_type=media_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="products.{format}"'
+        },
+    )
+
+
+# máximo de ids por chamada do batch-get
+BATCH_GET_MAX_IDS = 100
+
+
+class ProductBatchGet(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=BATCH_GET_MAX_IDS)
+
+
+# um item por id pedido, na mesma ordem, com product None e detail
+# preenchido quando o produto não existe (ou não está ativo)
+class ProductBatchItem(BaseModel):
+    id: int
+    product: ProductListingRead | None = None
+    detail: str | None = None
+
+
+class ProductBatchResult(BaseModel):
+    products: List[ProductBatchItem]
+
+
+product_batch_adapter = TypeAdapter(ProductBatchResult)
+
+
+# vários produtos pelo id de uma vez (carrinho, pedido...), com uma query só
+# (as categorias vêm no listing_categories) e um get_current_user só,
+# ao invés de uma chamada de GET /{product_id} pra cada
+@router.post(
+    '/batch-get', status_code=HTTPStatus.OK, response_model=ProductBatchResult
+)
+def batch_get_products(
+    data: ProductBatchGet, db: T_Session, current_user: T_CurrentUser
+):
+    query = select(Product).where(
+        Product.id.in_(set(data.ids)), Product.is_active
+    )
+    db_products = {product.id: product for product in db.scalars(query)}
+
+    return json_response(
+        product_batch_adapter,
+        {
+            'products': [
+                {'id': id, 'product': db_products[id]}
+                if id in db_products
+                else {'id': id, 'detail': 'Product not found'}
+                for id in data.ids
+            ]
+        },
+    )
 
 
 class ProductUpdate(BaseModel):
@@ -147,6 +576,97 @@ class ProductUpdate(BaseModel):
     categories_ids: List[int] | None = None
 
 
+# campos que dá pra alterar em lote, sem serial_code (unique) e categorias,
+# que continuam indo pelo PATCH /{product_id}
+class ProductBulkUpdate(BaseModel):
+    id: int
+    name: str | None = None
+    description: str | None = None
+    price: float | None = None
+    img_url: str | None = None
+
+
+class ProductBulkUpdateList(BaseModel):
+    products: List[ProductBulkUpdate]
+
+
+class BulkProductError(BaseModel):
+    id: int
+    detail: str
+
+
+class BulkUpdateResult(BaseModel):
+    updated: List[int]
+    errors: List[BulkProductError]
+
+
+# altera vários produtos de uma vez, em chunks (um commit por chunk), com
+# uma query de dono por chunk e UPDATE em lote ao invés de select/commit/
+# refresh por produto. Precisa vir antes do PATCH /{product_id}
+@router.patch(
+    '/bulk', status_code=HTTPStatus.OK, response_model=BulkUpdateResult
+)
+def bulk_update_products(
+    data: ProductBulkUpdateList, db: T_Session, current_user: T_CurrentUser
+):
+    # o mesmo id repetido seria aplicado e listado em updated duas vezes,
+    # então só vale a primeira ocorrência e as outras voltam como erro
+    seen, items = set(), []
+    updated, errors = [], []
+    for item in data.products:
+        if item.id in seen:
+            errors.append({'id': item.id, 'detail': 'Duplicate id'})
+            continue
+        seen.add(item.id)
+        items.append(item)
+
+    for start in range(0, len(items), BULK_UPDATE_CHUNK_SIZE):
+        chunk_updated, chunk_errors = update_chunk(
+            db, items[start : start + BULK_UPDATE_CHUNK_SIZE], current_user
+        )
+        updated.extend(chunk_updated)
+        errors.extend(chunk_errors)
+
+        for product_id in chunk_updated:
+            invalidate_product(product_id)
+
+    return {'updated': updated, 'errors': errors}
+
+
+class ProductBulkDelete(BaseModel):
+    ids: List[int]
+
+
+class BulkDeleteResult(BaseModel):
+    deleted: List[int]
+    errors: List[BulkProductError]
+
+
+# soft-delete de vários produtos com UPDATE ... WHERE id IN (...) por chunk,
+# é POST porque DELETE com corpo não é bem suportado por clientes/proxies
+@router.post(
+    '/bulk-delete', status_code=HTTPStatus.OK, response_model=BulkDeleteResult
+)
+def bulk_delete_products(
+    data: ProductBulkDelete, db: T_Session, current_user: T_CurrentUser
+):
+    # dict.fromkeys remove ids repetidos mantendo a ordem
+    ids = list(dict.fromkeys(data.ids))
+
+    deleted, errors = [], []
+    for start in range(0, len(ids), BULK_UPDATE_CHUNK_SIZE):
+        chunk_deleted, chunk_errors = delete_chunk(
+            db, ids[start : start + BULK_UPDATE_CHUNK_SIZE], current_user
+        )
+        deleted.extend(chunk_deleted)
+        errors.extend(chunk_errors)
+
+        for product_id in chunk_deleted:
+            invalidate_product(product_id)
+
+    return {'deleted': deleted, 'errors': errors}
+
+
 @router.patch(
     '/{product_id}', status_code=HTTPStatus.OK, response_model=ProductRead
 )
@@ -155,6 +675,7 @@ def update_product(
     data: ProductUpdate,
     db: T_Session,
     current_user: T_CurrentUser,
+    categories: T_CategoryResolver,
 ):
     query = (
         select(Product)
@@ -187,15 +708,15 @@ def update_product(
         ]
 
         # ---uma solução pro problema de caso alguma categoria não existem mais
-        # é verificar ela no db com a flag is_active
+        # é verificar ela no db com a flag is_active, o resolver já faz isso
+        # e da erro com todas as que não existem ao invés de ignorar
         if categories_ids_not_already_in_product:
-            query = select(Category).where(
-                Category.id.in_(categories_ids_not_already_in_product)
+            new_categories = categories.resolve(
+                categories_ids_not_already_in_product
             )
-
-            categories = db.scalars(query).all()
-            if categories:
-                db_product.categories.extend(categories)
+            db_product.categories.extend(new_categories)
+            # o resolve já tirou os ids repetidos, conta um por vínculo criado
+            increment_category_counts(db, [c.id for c in new_categories])
 
         # Maneira antiga que pensei, mas geraria várias querys pesquisando cada categoria,
         # então fiz da maneira acima que já busca tudo de uma vez
@@ -219,10 +740,18 @@ def update_product(
 
     db_product.updated_by = current_user
 
+    if (
+        'name' in data.model_fields_set
+        or 'description' in data.model_fields_set
+    ):
+        index_products(db, [db_product])
+
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
 
+    invalidate_product(db_product.id)
+
     return db_product
 
 
@@ -246,22 +775,121 @@ def delete_product(
         )
 
     db_product.is_active = False
+    increment_category_counts(
+        db,
+        db.scalars(
+            select(ProductCategoryAssociation.c.category_id).where(
+                ProductCategoryAssociation.c.product_id == product_id
+            )
+        ).all(),
+        delta=-1,
+    )
     db.commit()
 
+    invalidate_product(product_id)
+
     return {'message': 'Product deleted successfully'}
 
 
+class StockUpdate(BaseModel):
+    # None desliga o controle de estoque do produto
+    stock: int | None = Field(ge=0)
+    # > 0 divide o estoque em vários contadores, pra produto muito disputado
+    stock_shards: int = Field(default=0, ge=0, le=MAX_STOCK_SHARDS)
+
+
+class StockRead(BaseModel):
+    product_id: int
+    stock: int | None
+    stock_shards: int
+
+
+def get_stock_product(db, product_id: int, *where) -> Product:
+    db_product = db.scalar(
+        select(Product).where(
+            Product.id == product_id, Product.is_active, *where
+        )
+    )
+    if not db_product:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Product not found'
+        )
+    return db_product
+
+
+@router.get(
+    '/{product_id}/stock', status_code=HTTPStatus.OK, response_model=StockRead
+)
+def read_product_stock(product_id: int, db: T_Session):
+    db_product = get_stock_product(db, product_id)
+    return {
+        'product_id': db_product.id,
+        'stock': stock_level(db, db_product),
+        'stock_shards': db_product.stock_shards,
+    }
+
+
+# o estoque fica fora do ProductRead (e da ETag/cache do produto), então
+# mudar ele não invalida o cache do catálogo; o set_stock grava com UPDATE
+# direto, sem passar pelo version_id_col
+@router.put(
+    '/{product_id}/stock', status_code=HTTPStatus.OK, response_model=StockRead
+)
+def update_product_stock(
+    product_id: int,
+    data: StockUpdate,
+    db: T_Session,
+    current_user: T_CurrentUser,
+):
+    db_product = get_stock_product(
+        db, product_id, Product.created_by_id == current_user.id
+    )
+
+    set_stock(db, db_product, data.stock, data.stock_shards)
+    stock = {
+        'product_id': product_id,
+        'stock': data.stock,
+        'stock_shards': db_product.stock_shards,
+    }
+    db.commit()
+
+    return stock
+
+
+class CacheStats(BaseModel):
+    backend: str
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+# precisa vir antes do GET /{product_id}, senão 'cache' cai lá como id
+@router.get('/cache', status_code=HTTPStatus.OK, response_model=CacheStats)
+def read_cache_stats(current_user: T_CurrentUser):
+    return product_cache.stats()
+
+
 @router.get(
     '/{product_id}', status_code=HTTPStatus.OK, response_model=ProductRead
 )
-def get_product(product_id: int, db: T_Session, current_user: T_CurrentUser):
-    query = (
-        select(Product)
-        .options(joinedload(Product.categories))
-        .where(
-            Product.id == product_id,
-            Product.is_active,
-        )
+def get_product(
+    product_id: int,
+    db: T_Session,
+    current_user: T_CurrentUser,
+    if_none_match: T_IfNoneMatch = None,
+):
+    cache_key = product_cache.key(PRODUCT_NAMESPACE, str(product_id))
+    cached = product_cache.get(cache_key)
+    if cached:
+        if etag_matches(if_none_match, cached.headers['ETag']):
+            return not_modified(cached.headers['ETag'])
+        return cached_json_response(cached)
+
+    # uma linha só, com as categorias já no listing_categories
+    query = select(Product).where(
+        Product.id == product_id,
+        Product.is_active,
     )
 
     db_product = db.scalar(query)
@@ -271,4 +899,16 @@ def get_product(product_id: int, db: T_Session, current_user: T_CurrentUser):
             status_code=HTTPStatus.NOT_FOUND, detail='Product not found'
         )
 
-    return db_product
+    etag = make_etag(*product_etag_parts(db_product))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    cached = CachedResponse(
+        body=product_adapter.dump_json(
+            product_adapter.validate_python(db_product, from_attributes=True)
+        ),
+        headers={'ETag': etag},
+    )
+    product_cache.set(cache_key, cached)
+
+    return cached_json_response(cached)
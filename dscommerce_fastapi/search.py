@@ -0,0 +1,102 @@
+from sqlalchemy import (
+    column,
+    delete,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    table,
+)
+
+from dscommerce_fastapi.db.models.products import (
+    PG_SEARCH_DOCUMENT,
+    Product,
+)
+
+# tabela virtual do FTS5 (só existe no SQLite), o rowid é o id do produto
+products_fts = table(
+    'products_fts',
+    column('rowid'),
+    column('name'),
+    column('description'),
+)
+
+
+# o FTS5 tem sintaxe própria (aspas, AND, OR, NEAR, *...), então cada termo
+# vai entre aspas pra busca do usuário nunca virar erro de sintaxe
+def _fts5_query(q: str) -> str:
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+# aplica a busca por relevância de q na query de produtos, trocando a
+# ordenação pela do rank (mais relevante primeiro) e desempatando pelo id
+def apply_search(query, dialect: str, q: str):
+    if dialect == 'sqlite':
+        ranked = (
+            select(
+                products_fts.c.rowid.label('product_id'),
+                # bm25 retorna valores menores pros mais relevantes
+                literal_column('bm25(products_fts)').label('rank'),
+            )
+            .where(literal_column('products_fts').op('MATCH')(_fts5_query(q)))
+            .subquery()
+        )
+        return (
+            query.join(ranked, ranked.c.product_id == Product.id)
+            .order_by(None)
+            .order_by(ranked.c.rank, Product.id)
+        )
+
+    if dialect == 'postgresql':
+        # o documento tem que ser a mesma expressão do índice GIN,
+        # senão o postgres não usa o índice
+        document = literal_column(PG_SEARCH_DOCUMENT)
+        ts_query = func.plainto_tsquery(literal_column("'portuguese'"), q)
+        return (
+            query.where(document.op('@@')(ts_query))
+            .order_by(None)
+            .order_by(func.ts_rank(document, ts_query).desc(), Product.id)
+        )
+
+    # outros bancos não têm índice de texto, cai no LIKE mesmo
+    return query.where(
+        or_(Product.name.contains(q), Product.description.contains(q))
+    )
+
+
+# mantém o índice de texto sincronizado com os produtos, tem que ser chamado
+# depois do flush (pra ter o id) e antes do commit, na mesma transação
+def index_products(session, products):
+    index_search_rows(
+        session,
+        [
+            {'id': p.id, 'name': p.name, 'description': p.description}
+            for p in products
+        ],
+    )
+
+
+# mesma coisa que index_products, mas recebendo dicts com id, name e
+# description, pra quando os produtos foram inseridos sem passar pelo ORM
+def index_search_rows(session, rows):
+    if not rows or session.get_bind().dialect.name != 'sqlite':
+        # no postgres o índice GIN é de expressão, o próprio banco mantém
+        return
+
+    session.execute(
+        delete(products_fts).where(
+            products_fts.c.rowid.in_([row['id'] for row in rows])
+        )
+    )
+    session.execute(
+        insert(products_fts),
+        [
+            {
+                'rowid': row['id'],
+                'name': row['name'],
+                'description': row['description'] or '',
+            }
+            for row in rows
+        ],
+    )
@@ -9,3 +9,15 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+
+    # cache das respostas do catálogo: 'memory' (LRU do processo) ou
+    # 'shared' (substituto de um cache compartilhado tipo redis)
+    CACHE_BACKEND: str = 'memory'
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_TTL_SECONDS: int = 60
+
+    # por quanto tempo a resposta de um POST com Idempotency-Key é guardada
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+
+    # pedidos DELIVERED/CANCELED mais antigos que isso vão pro arquivo
+    ARCHIVE_AFTER_DAYS: int = 90
@@ -0,0 +1,189 @@
+import random
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from dscommerce_fastapi.db.models.order_item import OrderItem
+from dscommerce_fastapi.db.models.products import Product, ProductStockShard
+
+# limite de shards por produto, cada pedido tenta no máximo esse tanto
+MAX_STOCK_SHARDS = 64
+
+# UPDATE direto na tabela, sem passar pelo version_id_col do Product: o
+# estoque não vai na resposta do produto, então não muda a ETag dele
+products = Product.__table__
+# o updated_at também faz parte da ETag, e o onupdate dele vale pro UPDATE
+# direto; passando o próprio valor ele não é trocado
+KEEP_UPDATED_AT = {'updated_at': products.c.updated_at}
+shards = ProductStockShard.c
+
+
+# o estoque que dá pra vender do produto, somando os shards se tiver
+def stock_level(session, product: Product) -> int | None:
+    if product.stock_shards:
+        return session.scalar(
+            select(func.sum(shards.quantity)).where(
+                shards.product_id == product.id
+            )
+        )
+    return product.stock
+
+
+# define o estoque do produto (sem controle de estoque é stock None), e
+# com stock_shards > 0 já divide ele igualmente entre os shards. Grava com
+# UPDATE direto (sem bump do version, a ETag fica a mesma) e só acerta os
+# valores no objeto já carregado, sem deixar ele sujo pro flush
+def set_stock(session, product: Product, stock: int | None, stock_shards=0):
+    session.execute(
+        delete(ProductStockShard).where(shards.product_id == product.id)
+    )
+
+    if stock is None or not stock_shards:
+        stock_shards = 0
+    else:
+        base, extra = divmod(stock, stock_shards)
+        session.execute(
+            insert(ProductStockShard),
+            [
+                {
+                    'product_id': product.id,
+                    'shard': shard,
+                    'quantity': base + (1 if shard < extra else 0),
+                }
+                for shard in range(stock_shards)
+            ],
+        )
+        stock = None
+
+    session.execute(
+        update(products)
+        .where(products.c.id == product.id)
+        .values(stock=stock, stock_shards=stock_shards, **KEEP_UPDATED_AT)
+    )
+    set_committed_value(product, 'stock', stock)
+    set_committed_value(product, 'stock_shards', stock_shards)
+
+
+# desconta de um shard sorteado (e se ele não tiver o suficiente, dos
+# outros), cada tentativa é um UPDATE condicional de uma linha. Devolve o
+# shard de onde saiu, ou None se nenhum tinha o suficiente
+def _reserve_from_shards(session, product_id, stock_shards, quantity):
+    for shard in random.sample(range(stock_shards), stock_shards):
+        result = session.execute(
+            update(ProductStockShard)
+            .where(
+                shards.product_id == product_id,
+                shards.shard == shard,
+                shards.quantity >= quantity,
+            )
+            .values(quantity=shards.quantity - quantity)
+        )
+        if result.rowcount:
+            return shard
+    return None
+
+
+# reserva o estoque de todos os itens do pedido. Os produtos com um
+# contador só descontam todos num UPDATE ... SET stock = stock - :q WHERE
+# stock >= :q (o :q de cada um num CASE), sem ler o estoque antes nem
+# travar nada, se algum não tiver o suficiente o UPDATE não pega a linha
+# dele e ela não volta no RETURNING. quantities é {product_id: quantidade}
+# e products_rows as linhas de Product (pelo id) com stock e stock_shards.
+# Não commita, vai junto com o pedido: os descontos ficam num savepoint e
+# só ele é desfeito se faltar estoque. Devolve {product_id: shard} dos
+# produtos que tiveram estoque descontado, com shard None pros que saíram
+# do contador
+def reserve_stock(session, quantities: dict[int, int], products_rows):
+    counters = {
+        id: quantity
+        for id, quantity in quantities.items()
+        if products_rows[id].stock is not None
+    }
+    reserved = {}
+    missing = []
+
+    savepoint = session.begin_nested()
+
+    if counters:
+        needed = case(counters, value=products.c.id)
+        taken = set(
+            session.scalars(
+                update(products)
+                .where(products.c.id.in_(counters), products.c.stock >= needed)
+                .values(stock=products.c.stock - needed, **KEEP_UPDATED_AT)
+                .returning(products.c.id)
+            )
+        )
+        missing.extend(id for id in counters if id not in taken)
+        reserved.update(dict.fromkeys(taken))
+
+    for id, quantity in quantities.items():
+        stock_shards = products_rows[id].stock_shards
+        if not stock_shards:
+            continue
+        shard = _reserve_from_shards(session, id, stock_shards, quantity)
+        if shard is None:
+            missing.append(id)
+        else:
+            reserved[id] = shard
+
+    if missing:
+        # desfaz só o que já foi descontado dos outros produtos
+        savepoint.rollback()
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail=f'Insufficient stock: {sorted(missing)}',
+        )
+    savepoint.commit()
+
+    return reserved
+
+
+# devolve pro estoque o que foi reservado pros itens do pedido
+# (cancelamento). Só volta o que saiu (OrderItem.stock_reserved), e vai
+# pro modo de estoque que o produto tem agora: se ele passou a ter
+# controle depois do pedido nada volta, e se deixou de ter as unidades
+# somem junto com o estoque antigo
+def release_stock(session, order_id: int):
+    items = session.execute(
+        select(
+            OrderItem.product_id,
+            OrderItem.quantity,
+            OrderItem.stock_shard,
+            Product.stock,
+            Product.stock_shards,
+        )
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(OrderItem.order_id == order_id, OrderItem.stock_reserved)
+    ).all()
+
+    counters = {
+        item.product_id: item.quantity
+        for item in items
+        if item.stock is not None
+    }
+    if counters:
+        returned = case(counters, value=products.c.id)
+        session.execute(
+            update(products)
+            .where(products.c.id.in_(counters))
+            .values(stock=products.c.stock + returned, **KEEP_UPDATED_AT)
+        )
+
+    for item in items:
+        if not item.stock_shards:
+            continue
+        # o shard de onde saiu, se ele ainda existir
+        shard = item.stock_shard
+        if shard is None or shard >= item.stock_shards:
+            shard = random.randrange(item.stock_shards)
+        session.execute(
+            update(ProductStockShard)
+            .where(
+                shards.product_id == item.product_id,
+                shards.shard == shard,
+            )
+            .values(quantity=shards.quantity + item.quantity)
+        )
@@ -0,0 +1,34 @@
+"""products created_at microseconds
+
+Revision ID: 5531b492e942
+Revises: aa133eff02cb
+Create Date: 2026-10-18 15:42:13.556657
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5531b492e942'
+down_revision: Union[str, None] = 'aa133eff02cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # no sqlite o func.now() gravava 'YYYY-MM-DD HH:MM:SS', sem a fração
+    # que o sqlalchemy grava a partir de um datetime, e a comparação do
+    # cursor é de texto; completa as linhas antigas com a fração zerada
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "UPDATE products SET created_at = created_at || '.000000' "
+            'WHERE length(created_at) = 19'
+        )
+
+
+def downgrade() -> None:
+    # a fração zerada é o mesmo instante, não precisa desfazer
+    pass
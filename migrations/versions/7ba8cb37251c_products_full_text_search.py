@@ -0,0 +1,51 @@
+"""products full text search
+
+Revision ID: 7ba8cb37251c
+Revises: a103f3da1cd8
+Create Date: 2026-10-18 14:40:26.565531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7ba8cb37251c'
+down_revision: Union[str, None] = 'a103f3da1cd8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PG_SEARCH_DOCUMENT = (
+    "to_tsvector('portuguese', coalesce(products.name, '') || ' ' || "
+    "coalesce(products.description, ''))"
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS products_fts '
+            'USING fts5(name, description)'
+        )
+        # popula o índice com os produtos que já existem
+        op.execute(
+            'INSERT INTO products_fts (rowid, name, description) '
+            "SELECT id, name, coalesce(description, '') FROM products"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            'CREATE INDEX IF NOT EXISTS ix_products_search '
+            f'ON products USING gin ({PG_SEARCH_DOCUMENT})'
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS products_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_search')
@@ -0,0 +1,36 @@
+"""detach deleted categories from products
+
+Revision ID: 9cedcac77fa0
+Revises: ef0e6343dd27
+Create Date: 2026-10-18 15:09:30.783005
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9cedcac77fa0'
+down_revision: Union[str, None] = 'ef0e6343dd27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # categorias que já tinham sido removidas antes do delete_category
+    # passar a limpar os vínculos
+    op.execute(
+        'DELETE FROM product_category WHERE category_id IN '
+        '(SELECT id FROM categories WHERE NOT categories.is_active)'
+    )
+    op.execute(
+        'DELETE FROM category_product_count WHERE category_id IN '
+        '(SELECT id FROM categories WHERE NOT categories.is_active)'
+    )
+
+
+def downgrade() -> None:
+    # os vínculos removidos não têm como voltar
+    pass
@@ -0,0 +1,35 @@
+"""orders created_at microseconds
+
+Revision ID: dfe87a128b5f
+Revises: 5531b492e942
+Create Date: 2026-10-18 15:46:33.618785
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dfe87a128b5f'
+down_revision: Union[str, None] = '5531b492e942'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # mesmo caso de products (5531b492e942): completa com a fração zerada
+    # o created_at gravado pelo func.now() do sqlite, inclusive o dos
+    # pedidos que já foram arquivados
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('orders', 'orders_archive'):
+            op.execute(
+                f"UPDATE {table} SET created_at = created_at || '.000000' "
+                'WHERE length(created_at) = 19'
+            )
+
+
+def downgrade() -> None:
+    # a fração zerada é o mesmo instante, não precisa desfazer
+    pass
@@ -6,11 +6,14 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from dscommerce_fastapi.app import app
+from dscommerce_fastapi.cache import product_cache
+from dscommerce_fastapi.category_registry import category_registry
 from dscommerce_fastapi.database import get_session
 from dscommerce_fastapi.db import Base
 from tests.factories import (
     CategoryFactory,
     OrderFactory,
+    OrderItemFactory,
     PaymentFactory,
     ProductFactory,
     UserFactory,
@@ -41,6 +44,17 @@ from tests.factories import (
 #     img_url = factory.Faker('url')
 
 
+# o cache é do processo, e cada teste começa com um banco novo (com os
+# mesmos ids), então limpa pra um teste não receber resposta do outro
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    product_cache.clear()
+    category_registry.clear()
+    yield
+    product_cache.clear()
+    category_registry.clear()
+
+
 @pytest.fixture
 def client(session):
     def get_session_override():
@@ -83,6 +97,7 @@ def session():
     ProductFactory._meta.sqlalchemy_session = session
     CategoryFactory._meta.sqlalchemy_session = session
     OrderFactory._meta.sqlalchemy_session = session
+    OrderItemFactory._meta.sqlalchemy_session = session
     PaymentFactory._meta.sqlalchemy_session = session
 
     nested = connection.begin_nested()
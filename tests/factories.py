@@ -2,6 +2,7 @@ import factory
 import factory.fuzzy
 
 from dscommerce_fastapi.db.models.categories import Category
+from dscommerce_fastapi.db.models.order_item import OrderItem
 from dscommerce_fastapi.db.models.orders import Order
 from dscommerce_fastapi.db.models.payment import Payment
 from dscommerce_fastapi.db.models.products import Product
@@ -73,9 +74,21 @@ class OrderFactory(factory.alchemy.SQLAlchemyModelFactory):
 
     client = factory.SubFactory(UserFactory)
 
-    products = factory.List([
-        factory.SubFactory(ProductFactory),
-    ])
+    # um item (produto + quantidade) por pedido, criado depois do pedido
+    order_products_association = factory.RelatedFactoryList(
+        'tests.factories.OrderItemFactory', 'order', size=1
+    )
+
+
+class OrderItemFactory(factory.alchemy.SQLAlchemyModelFactory):
+    class Meta:
+        model = OrderItem
+        sqlalchemy_session_persistence = 'flush'
+
+    order = factory.SubFactory(OrderFactory)
+    product = factory.SubFactory(ProductFactory)
+    quantity = 1
+    unit_price = factory.LazyAttribute(lambda obj: obj.product.price)
 
 
 class PaymentFactory(factory.alchemy.SQLAlchemyModelFactory):
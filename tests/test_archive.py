@@ -0,0 +1,87 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from sqlalchemy import func, select
+
+from dscommerce_fastapi.archive import archive_orders
+from dscommerce_fastapi.db import utcnow
+from dscommerce_fastapi.db.models.archive import (
+    OrderArchive,
+    OrderItemArchive,
+    PaymentArchive,
+)
+from dscommerce_fastapi.db.models.orders import Order
+from tests.factories import OrderFactory, PaymentFactory
+
+
+def test_archive_orders(session, client, user, token):
+    old = utcnow() - timedelta(days=100)
+    delivered = OrderFactory(
+        client=user, status=Order.OrderStatus.DELIVERED, created_at=old
+    )
+    PaymentFactory(order=delivered)
+    canceled = OrderFactory(
+        client=user, status=Order.OrderStatus.CANCELED, created_at=old
+    )
+    # ainda pode mudar de status, fica
+    waiting = OrderFactory(client=user, created_at=old)
+    # finalizado mas recente, fica
+    recent = OrderFactory(
+        client=user,
+        status=Order.OrderStatus.DELIVERED,
+        created_at=utcnow(),
+    )
+    session.commit()
+    # os objetos expiram no commit do arquivamento e os arquivados somem
+    delivered_id, canceled_id = delivered.id, canceled.id
+    waiting_id, recent_id = waiting.id, recent.id
+
+    headers = {'Authorization': f'Bearer {token}'}
+    before = client.get(f'/orders/{delivered_id}', headers=headers).json()
+
+    # lotes de 1 pra passar por mais de um lote
+    archived = archive_orders(session, older_than_days=90, batch_size=1)
+
+    assert archived == 2  # noqa: PLR2004
+    assert session.scalars(select(Order.id).order_by(Order.id)).all() == [
+        waiting_id,
+        recent_id,
+    ]
+    assert session.scalars(
+        select(OrderArchive.c.id).order_by(OrderArchive.c.id)
+    ).all() == [delivered_id, canceled_id]
+    # archived_at naive em UTC, como o resto
+    archived_at = session.scalar(select(func.max(OrderArchive.c.archived_at)))
+    assert archived_at.tzinfo is None
+    assert utcnow() - archived_at < timedelta(minutes=1)
+    assert session.scalars(
+        select(OrderItemArchive.c.order_id).order_by(
+            OrderItemArchive.c.order_id
+        )
+    ).all() == [delivered_id, canceled_id]
+    assert session.scalars(select(PaymentArchive.c.order_id)).all() == [
+        delivered_id
+    ]
+
+    # GET /orders/{order_id} continua achando, do arquivo
+    response = client.get(f'/orders/{delivered_id}', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == before
+
+
+def test_get_archived_order_from_other_client(session, client, token):
+    order = OrderFactory(
+        status=Order.OrderStatus.DELIVERED,
+        created_at=utcnow() - timedelta(days=100),
+    )
+    session.commit()
+    order_id = order.id
+    archive_orders(session, older_than_days=90)
+
+    response = client.get(
+        f'/orders/{order_id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Order not found'}
@@ -0,0 +1,102 @@
+import pytest
+
+from dscommerce_fastapi.cache import (
+    CachedResponse,
+    LRUCache,
+    ResponseCache,
+    SharedCache,
+)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    # usar o 'a' faz o 'b' ser o menos usado
+    cache.get('a')
+    cache.set('c', b'3')
+
+    assert cache.get('a') == b'1'
+    assert cache.get('b') is None
+    assert cache.get('c') == b'3'
+
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_entries=2, ttl_seconds=-1)
+    cache.set('a', b'1')
+
+    assert cache.get('a') is None
+
+
+def test_shared_cache_evicts_expired_then_oldest():
+    cache = SharedCache(max_entries=2, ttl_seconds=-1)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    # 'a' e 'b' já expiraram, somem ao passar do limite
+    cache.ttl_seconds = 60
+    cache.set('c', b'3')
+
+    assert len(cache) == 1
+
+    cache.set('d', b'4')
+    cache.set('e', b'5')
+
+    assert cache.get('c') is None
+    assert cache.get('d') == b'4'
+    assert cache.get('e') == b'5'
+    assert len(cache) == 2  # noqa: PLR2004
+
+
+def test_shared_cache_get_drops_expired_entry():
+    cache = SharedCache(max_entries=10, ttl_seconds=-1)
+    cache.set('a', b'1')
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+BACKENDS = [
+    LRUCache(max_entries=10, ttl_seconds=60),
+    SharedCache(max_entries=10, ttl_seconds=60),
+]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_response_cache_invalidate_namespace(backend):
+    backend.clear()
+    cache = ResponseCache(backend)
+    response = CachedResponse(body=b'[]', headers={'X-Next-Cursor': 'abc'})
+
+    assert cache.get(cache.key('products', 'key')) is None
+    cache.set(cache.key('products', 'key'), response)
+    cache.set(cache.key('other', 'key'), response)
+
+    assert cache.get(cache.key('products', 'key')) == response
+
+    cache.invalidate('products')
+
+    assert cache.get(cache.key('products', 'key')) is None
+    assert cache.get(cache.key('other', 'key')) == response
+    assert cache.stats()['hits'] == 2  # noqa: PLR2004
+    assert cache.stats()['misses'] == 2  # noqa: PLR2004
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_response_cache_invalidate_between_get_and_set(backend):
+    backend.clear()
+    cache = ResponseCache(backend)
+    stale = CachedResponse(body=b'[1]', headers={})
+
+    # a rota resolve a chave e erra o cache, alguém invalida enquanto ela
+    # vai no banco, e só depois ela grava o que leu
+    list_key = cache.key('products', 'key')
+    detail_key = cache.key('product', '1')
+    assert cache.get(list_key) is None
+    assert cache.get(detail_key) is None
+    cache.invalidate('products')
+    cache.delete('product', '1')
+    cache.set(list_key, stale)
+    cache.set(detail_key, stale)
+
+    assert cache.get(cache.key('products', 'key')) is None
+    assert cache.get(cache.key('product', '1')) is None
@@ -1,10 +1,13 @@
 from http import HTTPStatus
 
+import pytest
 from pytest import param
+from sqlalchemy import event, select
 
-from dscommerce_fastapi.db.models.categories import Category
+from dscommerce_fastapi.category_tree import subtree_ids
+from dscommerce_fastapi.db.models.categories import Category, CategoryClosure
 from dscommerce_fastapi.routers.categories import read_categories
-from tests.factories import CategoryFactory
+from tests.factories import CategoryFactory, ProductFactory
 
 
 def test_create_category(client, user, token):
@@ -20,6 +23,8 @@ def test_create_category(client, user, token):
     assert response.json() == {
         'id': 1,
         'name': 'test_category',
+        'parent_id': None,
+        'product_count': 0,
     }
 
 
@@ -37,10 +42,14 @@ def test_read_categories(client, user, token):
             {
                 'id': category1.id,
                 'name': category1.name,
+                'parent_id': None,
+                'product_count': 0,
             },
             {
                 'id': category2.id,
                 'name': category2.name,
+                'parent_id': None,
+                'product_count': 0,
             },
         ]
     }
@@ -53,7 +62,7 @@ def test_read_categories_with_name_like(client, user, token):
     response = client.get(
         '/categories',
         headers={'Authorization': f'Bearer {token}'},
-        params={'name': 'test'},
+        params={'name': 'TEST'},
     )
 
     assert response.status_code == HTTPStatus.OK
@@ -62,11 +71,20 @@ def test_read_categories_with_name_like(client, user, token):
             {
                 'id': category2.id,
                 'name': category2.name,
+                'parent_id': None,
+                'product_count': 0,
             },
         ]
     }
 
 
+@pytest.mark.parametrize('params', [{'limit': -1}, {'offset': -1}])
+def test_read_categories_negative_pagination(client, params):
+    response = client.get('/categories', params=params)
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
 def test_update_category(client, user, token):
     category = CategoryFactory(created_by=user)
     response = client.patch(
@@ -81,6 +99,8 @@ def test_update_category(client, user, token):
     assert response.json() == {
         'id': category.id,
         'name': 'new name',
+        'parent_id': None,
+        'product_count': 0,
     }
 
 
@@ -110,6 +130,8 @@ def test_get_category(client, user, token):
     assert response.json() == {
         'id': category.id,
         'name': category.name,
+        'parent_id': None,
+        'product_count': 0,
     }
 
 
@@ -143,6 +165,38 @@ def test_delete_category(client, user, token):
     )
 
 
+def test_delete_category_removes_it_from_products(
+    session, client, user, token
+):
+    category, other = CategoryFactory.create_batch(2)
+    products = ProductFactory.create_batch(3, categories=[category, other])
+    statements = []
+
+    @event.listens_for(session.get_bind(), 'before_cursor_execute')
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    response = client.delete(
+        f'/categories/{category.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    event.remove(session.get_bind(), 'before_cursor_execute', count_statements)
+
+    assert response.status_code == HTTPStatus.OK
+    # os vínculos saem com um DELETE só, sem carregar os produtos
+    assert [
+        statement
+        for statement in statements
+        if statement.startswith('DELETE FROM product_category')
+    ] == [
+        'DELETE FROM product_category '
+        'WHERE product_category.category_id = ?'
+    ]
+    session.expire_all()
+    for product in products:
+        assert product.categories == [other]
+
+
 def test_delete_category_not_found(client, user, token):
     response = client.delete(
         '/categories/1',
@@ -151,3 +205,205 @@ def test_delete_category_not_found(client, user, token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json() == {'detail': 'Category not found'}
+
+
+def test_read_categories_served_from_registry(client, token):
+    category = CategoryFactory()
+
+    client.get('/categories')
+    response = client.get('/categories')
+    assert response.json() == {
+        'categories': [
+            {
+                'id': category.id,
+                'name': category.name,
+                'parent_id': None,
+                'product_count': 0,
+            }
+        ]
+    }
+
+    response = client.get(
+        '/categories/registry', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.json() == {
+        'version': response.json()['version'],
+        'size': 1,
+        'hits': 1,
+        'misses': 1,
+        'hit_rate': 0.5,
+    }
+
+
+def test_registry_rebuilt_after_category_changes(client, token):
+    category = CategoryFactory()
+    assert client.get('/categories').json()['categories'][0]['name'] == (
+        category.name
+    )
+
+    client.patch(
+        f'/categories/{category.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'new name'},
+    )
+    assert client.get('/categories').json() == {
+        'categories': [
+            {
+                'id': category.id,
+                'name': 'new name',
+                'parent_id': None,
+                'product_count': 0,
+            }
+        ]
+    }
+
+    client.delete(
+        f'/categories/{category.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert client.get('/categories').json() == {'categories': []}
+
+
+def test_category_product_count(client, user, token):
+    category = CategoryFactory()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    products_ids = [
+        client.post(
+            '/products',
+            headers=headers,
+            json={
+                'name': 'name',
+                'serial_code': serial_code,
+                'price': 100,
+                'img_url': 'url',
+                'categories_ids': [category.id],
+            },
+        ).json()['id']
+        for serial_code in ['code-1', 'code-2']
+    ]
+    client.delete(f'/products/{products_ids[0]}', headers=headers)
+
+    response = client.get(f'/categories/{category.id}', headers=headers)
+    assert response.json()['product_count'] == 1
+    response = client.get('/categories', headers=headers)
+    assert response.json()['categories'][0]['product_count'] == 1
+
+
+def test_category_tree(session, client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def create(name, parent_id=None):
+        return client.post(
+            '/categories',
+            headers=headers,
+            json={'name': name, 'parent_id': parent_id},
+        ).json()['id']
+
+    def subtree(category_id):
+        return set(session.scalars(subtree_ids(category_id)))
+
+    electronics = create('Electronics')
+    computers = create('Computers', electronics)
+    laptops = create('Laptops', computers)
+    other = create('Other')
+
+    assert subtree(electronics) == {electronics, computers, laptops}
+    # o caminho Electronics -> Laptops tem 2 níveis
+    assert session.execute(
+        select(CategoryClosure.c.depth).where(
+            CategoryClosure.c.ancestor_id == electronics,
+            CategoryClosure.c.descendant_id == laptops,
+        )
+    ).all() == [(2,)]
+
+    # não dá pra mover pra baixo dela mesma
+    response = client.patch(
+        f'/categories/{electronics}',
+        headers=headers,
+        json={'parent_id': laptops},
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    # move Computers (com Laptops junto) pra baixo de Other
+    response = client.patch(
+        f'/categories/{computers}', headers=headers, json={'parent_id': other}
+    )
+    assert response.json()['parent_id'] == other
+    assert subtree(electronics) == {electronics}
+    assert subtree(other) == {other, computers, laptops}
+
+    # removendo Computers, Laptops sobe pro Other
+    client.delete(f'/categories/{computers}', headers=headers)
+    assert subtree(other) == {other, laptops}
+    response = client.get(f'/categories/{laptops}', headers=headers)
+    assert response.json()['parent_id'] == other
+
+
+def test_create_category_parent_not_found(client, token):
+    response = client.post(
+        '/categories',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'name', 'parent_id': 999},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Parent category not found'}
+
+
+def test_read_category_products(client):
+    category = CategoryFactory()
+    products = ProductFactory.create_batch(3, categories=[category])
+    ProductFactory(categories=[category], is_active=False)
+    ProductFactory()
+
+    response = client.get(
+        f'/categories/{category.id}/products', params={'limit': 2}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [p['id'] for p in response.json()] == [
+        products[0].id,
+        products[1].id,
+    ]
+    assert response.json()[0]['categories'] == [
+        {'id': category.id, 'name': category.name}
+    ]
+    cursor = response.headers['X-Next-Cursor']
+
+    response = client.get(
+        f'/categories/{category.id}/products',
+        params={'limit': 2, 'cursor': cursor},
+    )
+
+    assert [p['id'] for p in response.json()] == [products[2].id]
+    # última página, não tem próximo cursor
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_read_category_products_cursor_from_other_listing(client):
+    category, other = CategoryFactory.create_batch(2)
+    ProductFactory.create_batch(2, categories=[category, other])
+
+    cursors = [
+        client.get('/products', params={'limit': 1}).headers['X-Next-Cursor'],
+        client.get(
+            f'/categories/{other.id}/products', params={'limit': 1}
+        ).headers['X-Next-Cursor'],
+    ]
+
+    for cursor in cursors:
+        response = client.get(
+            f'/categories/{category.id}/products',
+            params={'limit': 1, 'cursor': cursor},
+        )
+
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {'detail': 'Invalid cursor'}
+
+
+def test_read_category_products_not_found(client):
+    response = client.get('/categories/1/products')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Category not found'}
@@ -0,0 +1,37 @@
+from sqlalchemy import select
+
+from dscommerce_fastapi.db.models.categories import Category
+from dscommerce_fastapi.facets import (
+    increment_category_counts,
+    reconcile_category_counts,
+)
+from tests.factories import CategoryFactory, ProductFactory
+
+
+def test_reconcile_category_counts(session):
+    category = CategoryFactory()
+    category2 = CategoryFactory()
+    category3 = CategoryFactory(product_count=5)
+    ProductFactory(categories=[category, category2])
+    ProductFactory(categories=[category])
+    ProductFactory(categories=[category], is_active=False)
+
+    reconcile_category_counts(session)
+
+    assert session.execute(
+        select(Category.id, Category.product_count).order_by(Category.id)
+    ).all() == [(category.id, 2), (category2.id, 1), (category3.id, 0)]
+
+
+def test_increment_category_counts(session):
+    category = CategoryFactory()
+    category2 = CategoryFactory()
+
+    increment_category_counts(
+        session, [category.id, category.id, category2.id]
+    )
+    increment_category_counts(session, [category2.id], delta=-1)
+
+    assert session.execute(
+        select(Category.id, Category.product_count).order_by(Category.id)
+    ).all() == [(category.id, 2), (category2.id, 0)]
@@ -0,0 +1,82 @@
+from datetime import UTC, datetime, timedelta
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+
+from dscommerce_fastapi.db.models.idempotency import IdempotencyKey
+from dscommerce_fastapi.idempotency import (
+    IdempotentRequest,
+    cleanup_idempotency_keys,
+    request_hash,
+)
+from dscommerce_fastapi.schemas import Message
+
+
+def test_cleanup_idempotency_keys(session, user):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    for key, expires_at in [
+        ('expired-1', now - timedelta(hours=1)),
+        ('expired-2', now - timedelta(minutes=1)),
+        ('expired-3', now - timedelta(days=1)),
+        ('valid', now + timedelta(hours=1)),
+    ]:
+        session.add(
+            IdempotencyKey(
+                user_id=user.id,
+                key=key,
+                request_hash='hash',
+                status_code=201,
+                response_body='{}',
+                created_at=now,
+                expires_at=expires_at,
+            )
+        )
+    session.commit()
+
+    # lotes de 2, o último vem incompleto
+    deleted = cleanup_idempotency_keys(session, batch_size=2)
+
+    assert deleted == 3  # noqa: PLR2004
+    assert session.scalars(select(IdempotencyKey.key)).all() == ['valid']
+
+
+# replay() não achou nada, outra requisição com a mesma chave commitou
+# no meio e o commit() desta bate na chave primária
+def _commit_after_concurrent_request(session, user, stored_message):
+    idempotent = IdempotentRequest(session, 'key')
+    assert idempotent.replay(user.id, 'scope', Message(message='same')) is None
+
+    now = datetime.now(UTC).replace(tzinfo=None)
+    session.add(
+        IdempotencyKey(
+            user_id=user.id,
+            key='key',
+            request_hash=request_hash(
+                'scope', Message(message=stored_message).model_dump_json()
+            ),
+            status_code=HTTPStatus.CREATED,
+            response_body='{"stored": true}',
+            created_at=now,
+            expires_at=now + timedelta(hours=1),
+        )
+    )
+    session.commit()
+    session.expunge_all()
+
+    return idempotent.commit(Response(b'{}', HTTPStatus.CREATED))
+
+
+def test_idempotent_commit_lost_race_replays(session, user):
+    response = _commit_after_concurrent_request(session, user, 'same')
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert response.body == b'{"stored": true}'
+
+
+def test_idempotent_commit_lost_race_different_request(session, user):
+    with pytest.raises(HTTPException) as exc_info:
+        _commit_after_concurrent_request(session, user, 'other')
+
+    assert exc_info.value.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
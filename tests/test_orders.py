@@ -1,9 +1,14 @@
 from datetime import datetime
 from http import HTTPStatus
 
+import pytest
+from fastapi import HTTPException
 from freezegun import freeze_time
+from sqlalchemy import func, select, update
 
-from tests.factories import ProductFactory
+from dscommerce_fastapi.db.models.orders import Order
+from dscommerce_fastapi.order_status import transition_order
+from tests.factories import OrderFactory, ProductFactory
 
 
 def test_create_order(client, user):
@@ -22,33 +27,81 @@ def test_create_order(client, user):
     with freeze_time('2021-01-04 12:00:00'):
         response = client.post(
             '/orders',
-            json={'products_ids': [product1.id, product2.id]},
+            json={
+                'items': [
+                    {'product_id': product1.id, 'quantity': 2},
+                    {'product_id': product2.id, 'quantity': 1},
+                    # repetido vira uma linha só, somando a quantidade
+                    {'product_id': product1.id, 'quantity': 1},
+                ]
+            },
             headers={'Authorization': f'Bearer {token}'},
         )
 
     assert response.status_code == HTTPStatus.CREATED
-    assert response.json() == {
+    data = response.json()
+    assert data.pop('created_at')
+    assert data == {
         'id': 1,
         'status': 'WAITING_PAYMENT',
-        'created_at': '2021-01-04 12:00:00',
+        'total_amount': round(product1.price * 3 + product2.price, 2),
+        'item_count': 4,
         'client': {
             'id': user.id,
             'name': user.name,
         },
-        'products': [
+        'items': [
             {
-                'id': product1.id,
-                'name': product1.name,
+                'product': {'id': product1.id, 'name': product1.name},
+                'quantity': 3,
+                'unit_price': product1.price,
             },
             {
-                'id': product2.id,
-                'name': product2.name,
+                'product': {'id': product2.id, 'name': product2.name},
+                'quantity': 1,
+                'unit_price': product2.price,
             },
         ],
         'payment': None,
     }
 
 
+def test_get_order(client, user, token):
+    order = OrderFactory(client=user)
+    item = order.order_products_association[0]
+
+    response = client.get(
+        f'/orders/{order.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['items'] == [
+        {
+            'product': {'id': item.product.id, 'name': item.product.name},
+            'quantity': item.quantity,
+            'unit_price': item.unit_price,
+        }
+    ]
+
+
+def test_create_order_product_not_found(client, token):
+    product = ProductFactory()
+
+    response = client.post(
+        '/orders',
+        json={
+            'items': [
+                {'product_id': product.id, 'quantity': 1},
+                {'product_id': product.id + 1, 'quantity': 1},
+            ]
+        },
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Product not found'}
+
+
 # class OrderRead(BaseModel):
 #     id: int
 #     status: Order.OrderStatus
@@ -56,3 +109,175 @@ def test_create_order(client, user):
 #     client: UserRead
 #     products: list[ProductRead]
 #     payment: PaymentRead | None
+
+
+def test_order_keeps_price_after_product_update(client, user, token):
+    product = ProductFactory(created_by=user, price=10)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    order_id = client.post(
+        '/orders',
+        json={'items': [{'product_id': product.id, 'quantity': 2}]},
+        headers=headers,
+    ).json()['id']
+    response = client.patch(
+        f'/products/{product.id}', json={'price': 15}, headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.get(f'/orders/{order_id}', headers=headers)
+
+    # o pedido continua com o preço da compra
+    assert response.json()['total_amount'] == 20  # noqa: PLR2004
+    assert response.json()['items'][0]['unit_price'] == 10  # noqa: PLR2004
+
+
+def test_create_order_with_idempotency_key(session, client, token):
+    product = ProductFactory()
+    headers = {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'abc'}
+    json = {'items': [{'product_id': product.id, 'quantity': 1}]}
+
+    response = client.post('/orders', json=json, headers=headers)
+    # retry do mesmo pedido
+    retry = client.post('/orders', json=json, headers=headers)
+
+    assert retry.status_code == HTTPStatus.CREATED
+    assert retry.json() == response.json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert session.scalar(select(func.count()).select_from(Order)) == 1
+
+    # a mesma chave com outro corpo não é retry
+    json['items'][0]['quantity'] = 2
+    response = client.post('/orders', json=json, headers=headers)
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {
+        'detail': 'Idempotency-Key already used with a different request'
+    }
+
+
+def test_read_orders_history_with_cursor(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    old, middle, new = [
+        OrderFactory(client=user, created_at=datetime(2024, 1, day))
+        for day in [1, 2, 3]
+    ]
+    # pedido de outro cliente não aparece
+    OrderFactory()
+
+    response = client.get('/orders', headers=headers, params={'limit': 2})
+
+    assert response.status_code == HTTPStatus.OK
+    # do mais novo pro mais antigo
+    assert [o['id'] for o in response.json()] == [new.id, middle.id]
+
+    response = client.get(
+        '/orders',
+        headers=headers,
+        params={'limit': 2, 'cursor': response.headers['X-Next-Cursor']},
+    )
+
+    assert [o['id'] for o in response.json()] == [old.id]
+    # última página, não tem próximo cursor
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_read_orders_history_cursor_api_created(client, user):
+    product = ProductFactory()
+
+    # todos no mesmo instante, o desempate fica só pelo id
+    with freeze_time('2021-01-04 12:00:00'):
+        token = client.post(
+            '/auth/token',
+            data={'username': user.username, 'password': user.password},
+        ).json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        ids = [
+            client.post(
+                '/orders',
+                headers=headers,
+                json={'items': [{'product_id': product.id, 'quantity': 1}]},
+            ).json()['id']
+            for _ in range(5)
+        ]
+
+        seen = []
+        # o limite inclusivo pega os pedidos do mesmo instante
+        params = {'limit': 2, 'created_from': '2021-01-04T12:00:00'}
+        # com limite de páginas pra um cursor que não anda não travar o teste
+        for _ in range(len(ids)):
+            response = client.get('/orders', headers=headers, params=params)
+            seen.extend(o['id'] for o in response.json())
+            if 'X-Next-Cursor' not in response.headers:
+                break
+            params['cursor'] = response.headers['X-Next-Cursor']
+
+    assert seen == ids[::-1]
+
+
+def test_read_orders_history_filters(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    OrderFactory(client=user, created_at=datetime(2024, 1, 1))
+    paid = OrderFactory(
+        client=user,
+        created_at=datetime(2024, 1, 2),
+        status=Order.OrderStatus.PAID,
+    )
+    waiting = OrderFactory(client=user, created_at=datetime(2024, 1, 3))
+
+    response = client.get(
+        '/orders', headers=headers, params={'status': 'PAID'}
+    )
+    assert [o['id'] for o in response.json()] == [paid.id]
+
+    response = client.get(
+        '/orders',
+        headers=headers,
+        params={
+            'created_from': '2024-01-02T00:00:00',
+            'created_to': '2024-01-03T00:00:00',
+        },
+    )
+    assert [o['id'] for o in response.json()] == [waiting.id, paid.id]
+
+
+def test_cancel_order(session, client, user, token):
+    order = OrderFactory(client=user)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post(f'/orders/{order.id}/cancel', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'message': 'Order canceled successfully'}
+    session.refresh(order)
+    assert order.status == Order.OrderStatus.CANCELED
+    assert order.version == 2  # noqa: PLR2004
+
+    # CANCELED é final, não dá pra pagar depois
+    response = client.post(
+        '/payments', headers=headers, json={'order_id': order.id}
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {
+        'detail': 'Order cannot change from CANCELED to PAID'
+    }
+
+
+def test_transition_order_lost_race(session, user):
+    order = OrderFactory(client=user)
+    session.commit()
+
+    # outra requisição paga o pedido depois dele ter sido lido aqui
+    session.execute(
+        update(Order)
+        .where(Order.id == order.id)
+        .values(status=Order.OrderStatus.PAID)
+        .execution_options(synchronize_session=False)
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        transition_order(session, order, Order.OrderStatus.CANCELED)
+
+    assert exc.value.status_code == HTTPStatus.CONFLICT
+    assert exc.value.detail == 'Order status was changed by another request'
@@ -1,5 +1,8 @@
 from http import HTTPStatus
 
+from sqlalchemy import func, select
+
+from dscommerce_fastapi.db.models.payment import Payment
 from tests.factories import OrderFactory, PaymentFactory
 
 
@@ -14,6 +17,39 @@ def test_create_payment(client, user, token):
     assert response.json() == {'message': 'Payment created successfully'}
 
 
+def test_create_payment_with_idempotency_key(session, client, user, token):
+    order = OrderFactory(client=user)
+    headers = {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'abc'}
+
+    response = client.post(
+        '/payments', headers=headers, json={'order_id': order.id}
+    )
+    retry = client.post(
+        '/payments', headers=headers, json={'order_id': order.id}
+    )
+
+    assert retry.status_code == HTTPStatus.CREATED
+    assert retry.json() == response.json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert session.scalar(select(func.count()).select_from(Payment)) == 1
+
+
+def test_create_payment_order_already_paid(client, user, token):
+    order = OrderFactory(client=user)
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post('/payments', headers=headers, json={'order_id': order.id})
+
+    # sem Idempotency-Key o retry não vira um segundo pagamento
+    response = client.post(
+        '/payments', headers=headers, json={'order_id': order.id}
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {
+        'detail': 'Order cannot change from PAID to PAID'
+    }
+
+
 def test_create_payment_order_not_exist(client, user, token):
     response = client.post(
         '/payments',
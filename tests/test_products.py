@@ -1,8 +1,14 @@
+import json
+from datetime import datetime
 from http import HTTPStatus
 
-from sqlalchemy import select
+import pytest
+from sqlalchemy import event, func, select
 
+from dscommerce_fastapi.bulk_import import BULK_MAX_LINE_BYTES, LINE_TOO_LONG
+from dscommerce_fastapi.cache import product_cache
 from dscommerce_fastapi.db.models.products import Product
+from dscommerce_fastapi.routers import products as products_router
 from tests.conftest import ProductFactory
 from tests.factories import CategoryFactory
 
@@ -84,7 +90,44 @@ def test_create_product_category_not_exists(client, token):
     )
 
     assert response.status_code == HTTPStatus.NOT_FOUND
-    assert response.json() == {'detail': 'Category not found'}
+    assert response.json() == {'detail': 'Category not found: [1]'}
+
+
+def test_create_product_categories_from_registry(session, client, token):
+    categories_ids = [CategoryFactory().id for _ in range(5)]
+    session.commit()
+    statements = []
+
+    @event.listens_for(session.get_bind(), 'before_cursor_execute')
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for serial_code in ['code', 'code2']:
+        response = client.post(
+            '/products',
+            headers={'Authorization': f'Bearer {token}'},
+            json={
+                'name': 'name',
+                'serial_code': serial_code,
+                'price': 100,
+                'img_url': 'url',
+                'categories_ids': categories_ids,
+            },
+        )
+        assert response.status_code == HTTPStatus.CREATED
+    event.remove(session.get_bind(), 'before_cursor_execute', count_statements)
+
+    # só a primeira requisição monta a foto das categorias (uma query), a
+    # segunda valida as 5 categorias sem ir no banco
+    categories_selects = [
+        statement
+        for statement in statements
+        if 'FROM categories' in statement
+        # fora as categorias do produto criado, carregadas pra resposta
+        and 'product_category' not in statement
+    ]
+    assert len(categories_selects) == 1
+    assert 'categories.id IN' not in categories_selects[0]
 
 
 def test_read_products(client, token):
@@ -161,40 +204,40 @@ def test_update_product(client, user, token):
     }
 
 
+def test_update_product_repeated_category(session, client, user, token):
+    product = ProductFactory(created_by=user)
+    category = CategoryFactory(product_count=0)
+
+    response = client.patch(
+        f'/products/{product.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'categories_ids': [category.id, category.id]},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [c['id'] for c in response.json()['categories']].count(
+        category.id
+    ) == 1
+    # um vínculo só, então conta um só
+    session.refresh(category)
+    assert category.product_count == 1
+
+
 def test_update_product_category_not_exists(client, user, token):
     product = ProductFactory(created_by=user)
+    category = CategoryFactory()
     response = client.patch(
         f'/products/{product.id}',
         headers={'Authorization': f'Bearer {token}'},
         json={
             'name': 'new name',
-            'serial_code': 'new code',
-            'description': 'new description',
-            'price': 200,
-            'img_url': 'new url',
-            # se passar categoria que não existe ele não da erro, pela maneira que foi feito
-            # ele meio que só ignora mesmo
-            'categories_ids': [2],
+            # todas as categorias que não existem aparecem no erro
+            'categories_ids': [category.id, 998, 999],
         },
     )
 
-    assert response.status_code == HTTPStatus.OK
-    assert response.json() == {
-        'id': product.id,
-        'name': 'new name',
-        'serial_code': 'new code',
-        'description': 'new description',
-        'price': 200.0,
-        'img_url': 'new url',
-        'categories': [
-            {
-                # como categoria 2 não existe, o esperado é que tenha só a que já tinha
-                'id': product.categories[0].id,
-                'name': product.categories[0].name,
-            }
-            # for category in product.categories
-        ],
-    }
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Category not found: [998, 999]'}
 
 
 def test_get_product(client, token):
@@ -266,3 +309,818 @@ def test_delete_product_user_didnt_create_product(client, token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json() == {'detail': 'Product not found'}
+
+
+def test_read_products_with_cursor(client, token):
+    product = ProductFactory()
+    product2 = ProductFactory()
+    product3 = ProductFactory()
+
+    response = client.get(
+        '/products',
+        headers={'Authorization': f'Bearer {token}'},
+        params={'limit': 2},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [p['id'] for p in response.json()] == [product.id, product2.id]
+    cursor = response.headers['X-Next-Cursor']
+
+    response = client.get(
+        '/products',
+        headers={'Authorization': f'Bearer {token}'},
+        params={'limit': 2, 'cursor': cursor},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [p['id'] for p in response.json()] == [product3.id]
+    # última página, não tem próximo cursor
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_read_products_invalid_cursor(client, token):
+    response = client.get(
+        '/products',
+        headers={'Authorization': f'Bearer {token}'},
+        params={'cursor': 'invalid'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+def test_read_products_search(client, token):
+    category = CategoryFactory()
+
+    for name, description in [
+        ('Notebook Gamer', 'notebook com placa de vídeo'),
+        ('Mouse', 'mouse sem fio pra notebook'),
+        ('Teclado', 'teclado mecânico'),
+    ]:
+        client.post(
+            '/products',
+            headers={'Authorization': f'Bearer {token}'},
+            json={
+                'name': name,
+                'serial_code': name,
+                'description': description,
+                'price': 100,
+                'img_url': 'url',
+                'categories_ids': [category.id],
+            },
+        )
+
+    response = client.get('/products', params={'q': 'notebook'})
+
+    assert response.status_code == HTTPStatus.OK
+    # Notebook aparece no nome e na descrição, então vem primeiro
+    assert [p['name'] for p in response.json()] == ['Notebook Gamer', 'Mouse']
+
+
+def test_read_products_search_after_update(client, user, token):
+    category = CategoryFactory()
+    response = client.post(
+        '/products',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'name': 'Mouse',
+            'serial_code': 'code',
+            'price': 100,
+            'img_url': 'url',
+            'categories_ids': [category.id],
+        },
+    )
+    product_id = response.json()['id']
+
+    client.patch(
+        f'/products/{product_id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'Monitor'},
+    )
+
+    assert client.get('/products', params={'q': 'mouse'}).json() == []
+    assert [
+        p['id']
+        for p in client.get('/products', params={'q': 'monitor'}).json()
+    ] == [product_id]
+
+
+def test_read_products_search_with_cursor(client):
+    response = client.get(
+        '/products', params={'q': 'notebook', 'cursor': 'WzFd'}
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {
+        'detail': 'Cursor pagination is not supported with q'
+    }
+
+
+def test_bulk_create_products_ndjson(client, token):
+    product = ProductFactory()
+    category = CategoryFactory()
+
+    lines = [
+        json.dumps({
+            'name': 'name',
+            'serial_code': 'code-1',
+            'price': 100,
+            'img_url': 'url',
+            'categories_ids': [category.id],
+        }),
+        'not json',
+        json.dumps({
+            'name': 'name',
+            'serial_code': product.serial_code,
+            'price': 100,
+            'img_url': 'url',
+            'categories_ids': [category.id],
+        }),
+        json.dumps({
+            'name': 'name',
+            'serial_code': 'code-2',
+            'price': 100,
+            'img_url': 'url',
+            'categories_ids': [category.id, 999],
+        }),
+        json.dumps({'name': 'name'}),
+        json.dumps({
+            'name': 'name',
+            'serial_code': 'code-1',
+            'price': 100,
+            'img_url': 'url',
+            'categories_ids': [],
+        }),
+    ]
+
+    # o corpo vai em pedaços, igual chegaria num upload grande
+    def body():
+        for line in lines:
+            yield (line + '\n').encode()
+
+    response = client.post(
+        '/products/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=body(),
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'created': 1,
+        'errors': [
+            {'row': 2, 'detail': 'Invalid JSON'},
+            {'row': 3, 'detail': 'Product already exists'},
+            {'row': 4, 'detail': 'Category not found: [999]'},
+            {'row': 5, 'detail': 'serial_code: Field required'},
+            {'row': 6, 'detail': 'Product already exists'},
+        ],
+    }
+
+    response = client.get('/products', params={'q': 'name'})
+    assert [p['serial_code'] for p in response.json()] == ['code-1']
+    assert response.json()[0]['categories'] == [
+        {'id': category.id, 'name': category.name}
+    ]
+
+
+def test_bulk_create_products_csv(client, token):
+    category = CategoryFactory()
+    category2 = CategoryFactory()
+
+    content = (
+        'name,serial_code,description,price,img_url,categories_ids\n'
+        f'"Mouse, sem fio",code-1,,10.5,url,{category.id}|{category2.id}\n'
+        'Teclado,code-2,mecânico,abc,url,\n'
+    )
+
+    response = client.post(
+        '/products/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'text/csv',
+        },
+        content=content.encode(),
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'created': 1,
+        'errors': [
+            {
+                'row': 3,
+                'detail': (
+                    'price: Input should be a valid number, '
+                    'unable to parse string as a number'
+                ),
+            },
+        ],
+    }
+
+    response = client.get('/products')
+    assert response.json()[0]['name'] == 'Mouse, sem fio'
+    # description vazia no CSV fica None, igual sem a chave no NDJSON
+    assert response.json()[0]['description'] is None
+    assert response.json()[0]['price'] == 10.5  # noqa: PLR2004
+    assert [c['id'] for c in response.json()[0]['categories']] == [
+        category.id,
+        category2.id,
+    ]
+
+
+def test_bulk_create_products_invalid_lines(
+    session, client, token, monkeypatch
+):
+    monkeypatch.setattr(products_router, 'BULK_CHUNK_SIZE', 2)
+
+    def product(i):
+        return json.dumps({
+            'name': 'name',
+            'serial_code': f'code-{i}',
+            'price': 100,
+            'img_url': 'url',
+            'categories_ids': [],
+        }).encode()
+
+    # a linha longa demais chega em pedaços, sem ficar inteira no buffer
+    long_line = b'x' * (BULK_MAX_LINE_BYTES + 1)
+
+    def body():
+        yield product(1) + b'\n' + product(2) + b'\n' + product(3) + b'\n'
+        yield b'\xff\xfe\n'
+        yield long_line[:10]
+        yield long_line[10:]
+        yield b'x\n' + product(4) + b'\n'
+        yield long_line
+
+    response = client.post(
+        '/products/bulk',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=body(),
+    )
+
+    # as linhas ruins são erro delas, as boas antes e depois entram
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'created': 4,
+        'errors': [
+            {'row': 4, 'detail': 'Invalid UTF-8'},
+            {'row': 5, 'detail': LINE_TOO_LONG},
+            {'row': 7, 'detail': LINE_TOO_LONG},
+        ],
+    }
+    count = session.scalar(select(func.count()).select_from(Product))
+    assert count == 4  # noqa: PLR2004
+
+
+def test_bulk_create_products_unsupported_media_type(client, token):
+    response = client.post(
+        '/products/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[],
+    )
+
+    assert response.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+
+
+def test_get_product_is_cached_and_invalidated_on_update(client, user, token):
+    product = ProductFactory(created_by=user)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = client.get(f'/products/{product.id}', headers=headers)
+    second = client.get(f'/products/{product.id}', headers=headers)
+
+    assert first.json() == second.json()
+    stats = client.get('/products/cache', headers=headers).json()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+    client.patch(
+        f'/products/{product.id}', headers=headers, json={'name': 'new name'}
+    )
+
+    response = client.get(f'/products/{product.id}', headers=headers)
+    assert response.json()['name'] == 'new name'
+
+
+def test_read_products_cache_invalidated_on_category_update(
+    client, user, token
+):
+    category = CategoryFactory()
+    ProductFactory(categories=[category])
+
+    assert client.get('/products').json()[0]['categories'][0]['name'] == (
+        category.name
+    )
+
+    client.patch(
+        f'/categories/{category.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'new name'},
+    )
+
+    response = client.get('/products')
+    assert response.json()[0]['categories'][0]['name'] == 'new name'
+
+
+def test_get_product_if_none_match(client, user, token):
+    product = ProductFactory(created_by=user)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get(f'/products/{product.id}', headers=headers)
+    etag = response.headers['ETag']
+
+    response = client.get(
+        f'/products/{product.id}', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+    assert not response.content
+
+    # sem o cache ele compara só com as colunas da ETag
+    product_cache.clear()
+    response = client.get(
+        f'/products/{product.id}', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    client.patch(
+        f'/products/{product.id}', headers=headers, json={'price': 10}
+    )
+
+    response = client.get(
+        f'/products/{product.id}', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+def test_read_products_if_none_match(client):
+    ProductFactory()
+    ProductFactory()
+
+    etag = client.get('/products').headers['ETag']
+
+    response = client.get('/products', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    product_cache.clear()
+    response = client.get('/products', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    ProductFactory()
+    product_cache.clear()
+    response = client.get('/products', headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_export_products_ndjson(client, token, monkeypatch):
+    # chunk de 1 pra passar por várias partições do yield_per
+    monkeypatch.setattr(products_router, 'EXPORT_CHUNK_SIZE', 1)
+    product = ProductFactory()
+    product2 = ProductFactory()
+    ProductFactory(is_active=False)
+
+    response = client.get(
+        '/products/export', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['id'] for line in lines] == [product.id, product2.id]
+    assert lines[0]['categories'] == [
+        {'id': category.id, 'name': category.name}
+        for category in product.categories
+    ]
+
+
+def test_export_products_csv(client, token):
+    product = ProductFactory(description=None)
+
+    response = client.get(
+        '/products/export',
+        headers={'Authorization': f'Bearer {token}'},
+        params={'format': 'csv'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/csv')
+    assert response.text.splitlines() == [
+        'id,name,serial_code,description,price,img_url,categories_ids',
+        f'{product.id},{product.name},{product.serial_code},,'
+        f'{product.price},{product.img_url},{product.categories[0].id}',
+    ]
+
+
+def test_read_products_facets(client, user, token):
+    category = CategoryFactory()
+    category2 = CategoryFactory()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    for serial_code, name, categories_ids in [
+        ('code-1', 'Mouse', [category.id]),
+        ('code-2', 'Mouse gamer', [category.id, category2.id]),
+        ('code-3', 'Teclado', [category2.id]),
+    ]:
+        client.post(
+            '/products',
+            headers=headers,
+            json={
+                'name': name,
+                'serial_code': serial_code,
+                'price': 100,
+                'img_url': 'url',
+                'categories_ids': categories_ids,
+            },
+        )
+
+    # sem filtro vem do Category.product_count
+    response = client.get(
+        '/products', params={'facets': 'categories', 'limit': 1}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()['products']) == 1
+    assert response.json()['facets'] == {
+        'categories': [
+            {'id': category.id, 'name': category.name, 'count': 2},
+            {'id': category2.id, 'name': category2.name, 'count': 2},
+        ]
+    }
+
+    # com filtro conta só os produtos filtrados, não só a página
+    response = client.get(
+        '/products',
+        params={'facets': 'categories', 'name': 'Mouse', 'limit': 1},
+    )
+
+    assert response.json()['facets'] == {
+        'categories': [
+            {'id': category.id, 'name': category.name, 'count': 2},
+            {'id': category2.id, 'name': category2.name, 'count': 1},
+        ]
+    }
+
+    products_ids = [
+        p['id']
+        for p in client.get('/products', params={'q': 'teclado'}).json()
+    ]
+    client.delete(f'/products/{products_ids[0]}', headers=headers)
+
+    response = client.get('/products', params={'facets': 'categories'})
+    assert response.json()['facets']['categories'][1] == {
+        'id': category2.id,
+        'name': category2.name,
+        'count': 1,
+    }
+
+
+def test_read_products_price_range(client):
+    ProductFactory(price=10)
+    product = ProductFactory(price=50)
+    ProductFactory(price=100)
+
+    response = client.get(
+        '/products', params={'min_price': 20, 'max_price': 80}
+    )
+
+    assert [p['id'] for p in response.json()] == [product.id]
+
+
+@pytest.mark.parametrize(
+    ('sort', 'order'),
+    [
+        ('price', 'asc'),
+        ('price', 'desc'),
+        ('created_at', 'asc'),
+        ('created_at', 'desc'),
+        ('name', 'asc'),
+        ('name', 'desc'),
+    ],
+)
+def test_read_products_sorted_with_cursor(client, sort, order):
+    products = [
+        ProductFactory(
+            price=price,
+            name=name,
+            created_at=datetime(2024, 1, day),
+        )
+        for price, name, day in [
+            (30, 'b', 3),
+            (10, 'c', 1),
+            (30, 'a', 2),
+            (20, 'a', 5),
+            (50, 'd', 4),
+        ]
+    ]
+    expected = [
+        p.id
+        for p in sorted(
+            products,
+            key=lambda p: (getattr(p, sort), p.id),
+            reverse=order == 'desc',
+        )
+    ]
+
+    ids = []
+    params = {'sort': sort, 'order': order, 'limit': 2}
+    while True:
+        response = client.get('/products', params=params)
+        ids.extend(p['id'] for p in response.json())
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+
+    assert ids == expected
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_read_products_created_at_cursor_api_created(client, token, order):
+    # sem created_at explícito, vale o que a aplicação grava
+    ids = [
+        client.post(
+            '/products',
+            headers={'Authorization': f'Bearer {token}'},
+            json={
+                'name': f'name {i}',
+                'serial_code': f'code {i}',
+                'price': 10,
+                'img_url': 'url',
+                'categories_ids': [],
+            },
+        ).json()['id']
+        for i in range(5)
+    ]
+
+    seen = []
+    params = {'sort': 'created_at', 'order': order, 'limit': 2}
+    # com limite de páginas pra um cursor que não anda não travar o teste
+    for _ in range(len(ids)):
+        response = client.get('/products', params=params)
+        seen.extend(p['id'] for p in response.json())
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+
+    assert seen == (ids if order == 'asc' else ids[::-1])
+
+
+def test_read_products_cursor_from_other_sort(client):
+    ProductFactory()
+    ProductFactory()
+
+    cursor = client.get(
+        '/products', params={'sort': 'price', 'limit': 1}
+    ).headers['X-Next-Cursor']
+
+    response = client.get(
+        '/products', params={'sort': 'name', 'limit': 1, 'cursor': cursor}
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+def test_read_products_single_query(session, client):
+    ProductFactory.create_batch(3, categories=CategoryFactory.create_batch(2))
+    statements = []
+
+    @event.listens_for(session.get_bind(), 'before_cursor_execute')
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    response = client.get('/products')
+    event.remove(session.get_bind(), 'before_cursor_execute', count_statements)
+
+    assert response.status_code == HTTPStatus.OK
+    assert [len(p['categories']) for p in response.json()] == [2, 2, 2]
+    # as categorias vêm do listing_categories, sem query em product_category
+    assert len(statements) == 1
+    assert 'product_category' not in statements[0]
+
+
+def test_listing_categories_follows_category_rename_and_delete(
+    session, client, token, monkeypatch
+):
+    # chunk pequeno pra reescrita passar por mais de um lote
+    monkeypatch.setattr('dscommerce_fastapi.listing.LISTING_CHUNK_SIZE', 2)
+    category, other = CategoryFactory.create_batch(2)
+    ProductFactory.create_batch(5, categories=[category, other])
+
+    client.patch(
+        f'/categories/{category.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'name': 'new name'},
+    )
+    session.expire_all()
+    assert {
+        tuple(sorted(c['name'] for c in p.listing_categories))
+        for p in session.scalars(select(Product))
+    } == {tuple(sorted(['new name', other.name]))}
+
+    client.delete(
+        f'/categories/{category.id}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    response = client.get('/products')
+    assert [p['categories'] for p in response.json()] == [
+        [{'id': other.id, 'name': other.name}]
+    ] * 5
+
+
+def test_batch_get_products(session, client, token):
+    category = CategoryFactory()
+    product, product2 = ProductFactory.create_batch(2, categories=[category])
+    deleted = ProductFactory(is_active=False)
+    statements = []
+
+    @event.listens_for(session.get_bind(), 'before_cursor_execute')
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    response = client.post(
+        '/products/batch-get',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ids': [product2.id, 999, product.id, deleted.id]},
+    )
+    event.remove(session.get_bind(), 'before_cursor_execute', count_statements)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'products': [
+            {
+                'id': p.id,
+                'product': {
+                    'id': p.id,
+                    'name': p.name,
+                    'serial_code': p.serial_code,
+                    'description': p.description,
+                    'price': p.price,
+                    'img_url': p.img_url,
+                    'categories': [{'id': category.id, 'name': category.name}],
+                },
+                'detail': None,
+            }
+            if p
+            else {'id': id, 'product': None, 'detail': 'Product not found'}
+            for id, p in [
+                (product2.id, product2),
+                (999, None),
+                (product.id, product),
+                (deleted.id, None),
+            ]
+        ]
+    }
+    # fora o usuário do token, uma query só pros produtos
+    assert len([s for s in statements if 'FROM users' not in s]) == 1
+
+
+def test_batch_get_products_too_many_ids(client, token):
+    response = client.post(
+        '/products/batch-get',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ids': list(range(products_router.BATCH_GET_MAX_IDS + 1))},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_bulk_update_products(session, client, user, token, monkeypatch):
+    monkeypatch.setattr(products_router, 'BULK_UPDATE_CHUNK_SIZE', 2)
+    product, product2, product3 = ProductFactory.create_batch(
+        3, created_by=user
+    )
+    other_user_product = ProductFactory(price=5)
+
+    response = client.patch(
+        '/products/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'products': [
+                {'id': product.id, 'price': 10},
+                {'id': other_user_product.id, 'price': 10},
+                {'id': product2.id, 'price': 20, 'name': 'renamed'},
+                {'id': product3.id},
+            ]
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'updated': [product.id, product2.id],
+        'errors': [
+            {'id': other_user_product.id, 'detail': 'Product not found'},
+            {'id': product3.id, 'detail': 'Nothing to update'},
+        ],
+    }
+    session.expire_all()
+    assert (product.price, product.version) == (10, 2)
+    assert (product2.price, product2.name) == (20, 'renamed')
+    assert product2.updated_by_id == user.id
+    assert other_user_product.price == 5  # noqa: PLR2004
+    response = client.get('/products', params={'q': 'renamed'})
+    assert [p['id'] for p in response.json()] == [product2.id]
+
+
+def test_bulk_update_products_nulls_and_duplicates(
+    session, client, user, token
+):
+    product, product2 = ProductFactory.create_batch(2, created_by=user)
+    name = product.name
+
+    response = client.patch(
+        '/products/bulk',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'products': [
+                {'id': product.id, 'name': None, 'price': None},
+                {'id': product2.id, 'description': None},
+                {'id': product2.id, 'price': 30},
+            ]
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'updated': [product2.id],
+        'errors': [
+            {'id': product2.id, 'detail': 'Duplicate id'},
+            {'id': product.id, 'detail': 'Fields cannot be null: name, price'},
+        ],
+    }
+    session.expire_all()
+    assert product.name == name
+    assert product2.description is None
+    assert product2.version == 2  # noqa: PLR2004
+
+
+def test_bulk_delete_products(session, client, user, token):
+    # produtos das factories não passam pela API, então a contagem vem pronta
+    category = CategoryFactory(product_count=3)
+    products = ProductFactory.create_batch(
+        2, created_by=user, categories=[category]
+    )
+    other_user_product = ProductFactory(categories=[category])
+
+    response = client.post(
+        '/products/bulk-delete',
+        headers={'Authorization': f'Bearer {token}'},
+        json={'ids': [p.id for p in products] + [other_user_product.id, 999]},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'deleted': [p.id for p in products],
+        'errors': [
+            {'id': other_user_product.id, 'detail': 'Product not found'},
+            {'id': 999, 'detail': 'Product not found'},
+        ],
+    }
+    assert [p['id'] for p in client.get('/products').json()] == [
+        other_user_product.id
+    ]
+    facets = client.get('/products', params={'facets': 'categories'}).json()
+    assert facets['facets']['categories'] == [
+        {'id': category.id, 'name': category.name, 'count': 1}
+    ]
+
+
+def test_bulk_delete_products_already_deleted(session, client, user, token):
+    category = CategoryFactory(product_count=1)
+    product = ProductFactory(created_by=user, categories=[category])
+    headers = {'Authorization': f'Bearer {token}'}
+    client.delete(f'/products/{product.id}', headers=headers)
+
+    response = client.post(
+        '/products/bulk-delete', headers=headers, json={'ids': [product.id]}
+    )
+
+    # o UPDATE não pega o já removido, então a contagem não cai de novo
+    assert response.json() == {
+        'deleted': [],
+        'errors': [{'id': product.id, 'detail': 'Product not found'}],
+    }
+    session.refresh(category)
+    assert category.product_count == 0
+
+
+def test_read_products_category_with_subcategories(client):
+    electronics = CategoryFactory()
+    computers = CategoryFactory(parent_id=electronics.id)
+    laptops = CategoryFactory(parent_id=computers.id)
+    other = CategoryFactory()
+    laptop = ProductFactory(categories=[laptops])
+    computer = ProductFactory(categories=[computers, other])
+    ProductFactory(categories=[other])
+
+    response = client.get('/products', params={'category_id': electronics.id})
+    assert [p['id'] for p in response.json()] == [laptop.id, computer.id]
+
+    response = client.get('/products', params={'category_id': laptops.id})
+    assert [p['id'] for p in response.json()] == [laptop.id]
@@ -0,0 +1,196 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from dscommerce_fastapi.cache import product_cache
+from dscommerce_fastapi.db.models.orders import Order
+from dscommerce_fastapi.db.models.products import ProductStockShard
+from dscommerce_fastapi.stock import reserve_stock
+from tests.factories import ProductFactory
+
+
+def create_order(client, token, items):
+    return client.post(
+        '/orders',
+        json={
+            'items': [
+                {'product_id': product.id, 'quantity': quantity}
+                for product, quantity in items
+            ]
+        },
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+
+def test_create_order_reserves_stock(session, client, token):
+    product = ProductFactory(stock=5)
+    untracked = ProductFactory()
+    session.commit()
+
+    response = create_order(client, token, [(product, 3), (untracked, 10)])
+
+    assert response.status_code == HTTPStatus.CREATED
+    session.refresh(product)
+    assert product.stock == 2  # noqa: PLR2004
+
+
+def test_create_order_insufficient_stock(session, client, token):
+    product = ProductFactory(stock=5)
+    product2 = ProductFactory(stock=1)
+    session.commit()
+
+    response = create_order(client, token, [(product, 3), (product2, 2)])
+
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json() == {
+        'detail': f'Insufficient stock: {[product2.id]}'
+    }
+    # nada foi descontado e o pedido não existe
+    session.refresh(product)
+    assert product.stock == 5  # noqa: PLR2004
+    assert session.scalar(select(func.count()).select_from(Order)) == 0
+
+
+def test_cancel_order_releases_stock(session, client, token):
+    product = ProductFactory(stock=5)
+    session.commit()
+    order_id = create_order(client, token, [(product, 3)]).json()['id']
+
+    response = client.post(
+        f'/orders/{order_id}/cancel',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    session.refresh(product)
+    assert product.stock == 5  # noqa: PLR2004
+
+
+def test_sharded_stock(session, client, user, token):
+    product = ProductFactory(created_by=user)
+    session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.put(
+        f'/products/{product.id}/stock',
+        json={'stock': 10, 'stock_shards': 4},
+        headers=headers,
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'product_id': product.id,
+        'stock': 10,
+        'stock_shards': 4,
+    }
+    # dividido igual entre os shards, o resto nos primeiros
+    assert session.scalars(
+        select(ProductStockShard.c.quantity).order_by(
+            ProductStockShard.c.shard
+        )
+    ).all() == [3, 3, 2, 2]
+
+    # cada pedido desconta de um shard que tenha o suficiente
+    assert create_order(client, token, [(product, 3)]).status_code == (
+        HTTPStatus.CREATED
+    )
+    assert create_order(client, token, [(product, 3)]).status_code == (
+        HTTPStatus.CREATED
+    )
+    # sobram 4, mas nenhum shard sozinho tem 3
+    response = create_order(client, token, [(product, 3)])
+    assert response.status_code == HTTPStatus.CONFLICT
+
+    response = client.get(f'/products/{product.id}/stock')
+    assert response.json()['stock'] == 4  # noqa: PLR2004
+
+
+def test_cancel_order_after_stock_mode_change(session, client, user, token):
+    product = ProductFactory(created_by=user)
+    session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    # sem controle de estoque no pedido, nada foi descontado
+    order_id = create_order(client, token, [(product, 3)]).json()['id']
+    client.put(
+        f'/products/{product.id}/stock', json={'stock': 5}, headers=headers
+    )
+
+    response = client.post(f'/orders/{order_id}/cancel', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    # nada volta, o estoque continua o que foi definido
+    response = client.get(f'/products/{product.id}/stock')
+    assert response.json()['stock'] == 5  # noqa: PLR2004
+
+
+def test_cancel_order_releases_to_reserved_shard(session, client, user, token):
+    product = ProductFactory(created_by=user)
+    session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    client.put(
+        f'/products/{product.id}/stock',
+        json={'stock': 10, 'stock_shards': 4},
+        headers=headers,
+    )
+    order_id = create_order(client, token, [(product, 2)]).json()['id']
+
+    client.post(f'/orders/{order_id}/cancel', headers=headers)
+
+    # volta pro mesmo shard de onde saiu
+    assert session.scalars(
+        select(ProductStockShard.c.quantity).order_by(
+            ProductStockShard.c.shard
+        )
+    ).all() == [3, 3, 2, 2]
+
+
+def test_reserve_stock_rolls_back_only_its_savepoint(session):
+    product = ProductFactory(stock=5)
+    short = ProductFactory(stock=1)
+    session.commit()
+    # o que quem chamou já tinha feito na transação fica
+    product.name = 'renamed'
+    session.flush()
+
+    with pytest.raises(HTTPException) as exc_info:
+        reserve_stock(
+            session,
+            {product.id: 3, short.id: 2},
+            {product.id: product, short.id: short},
+        )
+
+    assert exc_info.value.detail == f'Insufficient stock: {[short.id]}'
+    session.commit()
+    session.refresh(product)
+    assert (product.name, product.stock) == ('renamed', 5)
+
+
+def test_set_stock_keeps_product_etag(session, client, user, token):
+    product = ProductFactory(created_by=user)
+    session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get(f'/products/{product.id}', headers=headers).headers[
+        'ETag'
+    ]
+
+    for stock in [{'stock': 10, 'stock_shards': 2}, {'stock': 5}]:
+        response = client.put(
+            f'/products/{product.id}/stock', json=stock, headers=headers
+        )
+        assert response.status_code == HTTPStatus.OK
+    # reservar também não mexe na linha do produto além do estoque
+    order_id = create_order(client, token, [(product, 1)]).json()['id']
+    client.post(f'/orders/{order_id}/cancel', headers=headers)
+
+    session.refresh(product)
+    assert (product.stock, product.stock_shards, product.version) == (
+        5,
+        0,
+        1,
+    )
+    # sem o cache, a ETag calculada de novo é a mesma
+    product_cache.clear()
+    response = client.get(f'/products/{product.id}', headers=headers)
+    assert response.headers['ETag'] == etag